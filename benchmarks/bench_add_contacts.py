@@ -0,0 +1,58 @@
+"""
+بنچمارک افزودن مخاطب (user-017): مخاطب در دقیقه با انتظارهای شرطی add_single_contact
+روی صفحه‌ی محلی شبیه ایتا (tests/mock_eitaa).
+
+    python benchmarks/bench_add_contacts.py [--contacts 30] [--paced]
+
+بدون --paced فقط هزینه‌ی خود صفحه اندازه‌گیری می‌شود؛ با --paced همان محدودکننده‌ی
+CONTACT_MIN_INTERVAL..CONTACT_MAX_INTERVAL کارگر افزودن مخاطبین هم اعمال می‌شود.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import common
+from playwright.async_api import async_playwright
+
+from mock_eitaa.server import MockEitaaServer
+from src import browser_ops
+from src.rate_limiter import RateLimiter
+from src.services import CONTACT_MIN_INTERVAL, CONTACT_MAX_INTERVAL
+
+
+async def main(args):
+    with MockEitaaServer() as server:
+        async with async_playwright() as playwright:
+            browser = await common.launch_chromium(playwright)
+            context = await browser_ops.new_account_context(browser)
+            page = await context.new_page()
+            await page.goto(server.url)
+
+            limiter = RateLimiter(CONTACT_MIN_INTERVAL, CONTACT_MAX_INTERVAL, name="contacts") if args.paced else None
+            durations = []
+            started = time.perf_counter()
+            for i in range(args.contacts):
+                if limiter:
+                    await limiter.acquire()
+                contact_started = time.perf_counter()
+                contact = {"name": f"مخاطب {i}", "phone": f"912{i:07d}"}
+                success, kind = await browser_ops.add_single_contact(page, contact, i, args.contacts, "+98")
+                durations.append(time.perf_counter() - contact_started)
+                if not success:
+                    raise RuntimeError(f"افزودن مخاطب {i} ناموفق بود ({kind})")
+            elapsed = time.perf_counter() - started
+            await browser.close()
+
+        added = len(server.contacts)
+    print(f"{added}/{args.contacts} contacts in {elapsed:.1f}s -> {added / elapsed * 60:.1f} contacts/min "
+          f"(per contact median {statistics.median(durations):.2f}s, p95 {common.percentile(durations, 0.95):.2f}s, "
+          f"pacing {'on' if args.paced else 'off'})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--contacts", type=int, default=30)
+    parser.add_argument("--paced", action="store_true")
+    asyncio.run(main(parser.parse_args()))
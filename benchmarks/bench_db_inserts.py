@@ -0,0 +1,95 @@
+"""
+بنچمارک سرعت درج گزارش ارسال (user-002)
+
+    python benchmarks/bench_db_inserts.py [--rows 2000] [--batch 100]
+
+سه روش روی فایل‌های جدا مقایسه می‌شوند:
+  before  - روش قبلی: اتصال تازه برای هر درج، commit و بستن (ژورنال DELETE و synchronous پیش‌فرض)
+  pooled  - Database.save_dispatch_report روی اتصال ماندگار هر ترد با WAL
+  batched - Database.save_dispatch_reports با دسته‌های --batch تایی در یک تراکنش
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+import common
+from database import Database
+
+INSERT_QUERY = '''
+    INSERT INTO dispatch_reports (user_id, status, error_message, operation_type, message_content, phone_number)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+
+def sample_report(i):
+    return {
+        "user_id": f"@user{i}", "status": "success", "error_message": "ارسال با موفقیت انجام شد.",
+        "operation_type": "excel", "message_content": "پیام آزمایشی", "phone_number": "+989120000000",
+    }
+
+
+def fresh_database(name):
+    path = os.path.join(common.SCRATCH_DIR, name)
+    database = Database(path)
+    return path, database
+
+
+def bench_before(rows):
+    path, database = fresh_database("before.db")
+    database.close()
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.close()
+
+    started = time.perf_counter()
+    for i in range(rows):
+        r = sample_report(i)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(INSERT_QUERY, (r["user_id"], r["status"], r["error_message"], r["operation_type"],
+                                    r["message_content"], r["phone_number"]))
+        conn.commit()
+        conn.close()
+    return time.perf_counter() - started
+
+
+def bench_pooled(rows):
+    _, database = fresh_database("pooled.db")
+    started = time.perf_counter()
+    for i in range(rows):
+        r = sample_report(i)
+        database.save_dispatch_report(r["user_id"], r["status"], r["error_message"], r["operation_type"],
+                                      r["message_content"], r["phone_number"])
+    elapsed = time.perf_counter() - started
+    database.close()
+    return elapsed
+
+
+def bench_batched(rows, batch):
+    _, database = fresh_database("batched.db")
+    started = time.perf_counter()
+    for start in range(0, rows, batch):
+        database.save_dispatch_reports([sample_report(i) for i in range(start, min(start + batch, rows))])
+    elapsed = time.perf_counter() - started
+    database.close()
+    return elapsed
+
+
+def main(args):
+    results = [
+        ("before", bench_before(args.rows)),
+        ("pooled", bench_pooled(args.rows)),
+        (f"batched x{args.batch}", bench_batched(args.rows, args.batch)),
+    ]
+    baseline = results[0][1]
+    for name, elapsed in results:
+        print(f"{name:>12}: {args.rows / elapsed:10.0f} inserts/sec  ({elapsed:.2f}s, {baseline / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=100)
+    main(parser.parse_args())
@@ -0,0 +1,128 @@
+"""
+بنچمارک حافظه‌ی خروجی گزارش‌ها (user-008) روی جدول یک میلیون ردیفی
+
+    python benchmarks/bench_export_memory.py [--rows 1000000]
+
+جدول dispatch_reports یک بار ساخته می‌شود و سپس هر قالب (csv، jsonl، xlsx) برای هر دو خروجی
+(گزارش کامل و لیست آی‌دی‌ها) در یک پردازه‌ی تازه اجرا می‌شود؛ همان مولدهای src/api.py مستقیماً
+مصرف می‌شوند (بدون TestClient که پاسخ را در حافظه جمع می‌کند). برای هر اجرا زمان اولین بایت،
+زمان کل، RSS پس از هر یک چهارم ردیف‌ها و بیشینه‌ی RSS نسبت به RSS پیش از شروع گزارش می‌شود.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import common
+
+FORMATS = ("csv", "jsonl", "xlsx")
+EXPORTS = ("report", "ids")
+
+
+def current_rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def build_table(path, rows):
+    from database import Database
+
+    database = Database(path)
+    conn = database.get_connection()
+    batch = 50_000
+    statuses = ("success", "failed", "skipped")
+    for start in range(0, rows, batch):
+        conn.executemany(
+            "INSERT INTO dispatch_reports (user_id, status, error_message, operation_type, message_content, timestamp, phone_number) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((f"@user{i % (rows // 2 or 1)}", statuses[i % 3], "ارسال با موفقیت انجام شد.", "excel", "پیام آزمایشی " * 5,
+              f"2026-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00", "+989120000000")
+             for i in range(start, min(start + batch, rows)))
+        )
+        conn.commit()
+    database.close()
+
+
+def run_child(path, export, export_format, rows):
+    """اجرای یک خروجی در همین پردازه (فراخوانی شده در پردازه‌ی فرزند)"""
+    from database import Database
+    from src import api
+
+    database = Database(path)
+    baseline = current_rss_mb()
+    if export == "report":
+        header, data = api.REPORT_EXPORT_HEADER, api._report_export_rows(database.iter_dispatch_reports())
+    else:
+        header, data = ["آی‌دی کاربر"], ([user_id] for user_id in database.iter_dispatch_user_ids())
+
+    checkpoints = []
+    step = max(rows // 4, 1)
+
+    def counted(source):
+        for i, row in enumerate(source, start=1):
+            if i % step == 0:
+                checkpoints.append(round(current_rss_mb() - baseline, 1))
+            yield row
+
+    started = time.perf_counter()
+    first_byte = None
+    size = 0
+    if export_format == "xlsx":
+        out_path = os.path.join(common.SCRATCH_DIR, "export.xlsx")
+        api._write_xlsx(out_path, "Report", header, counted(data), api.REPORT_EXPORT_WIDTHS)
+        size = os.path.getsize(out_path)
+        first_byte = time.perf_counter() - started
+    else:
+        iterator = api._iter_csv if export_format == "csv" else api._iter_jsonl
+        with open(os.devnull, "wb") as sink:
+            for chunk in iterator(header, counted(data)):
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                size += len(chunk)
+                sink.write(chunk)
+
+    return {
+        "export": export,
+        "format": export_format,
+        "first_byte_s": round(first_byte, 3),
+        "total_s": round(time.perf_counter() - started, 2),
+        "size_mb": round(size / 1024 / 1024, 1),
+        "rss_growth_mb_per_quarter": checkpoints,
+        "peak_over_baseline_mb": round(common.peak_rss_mb() - baseline, 1),
+    }
+
+
+def main(args):
+    if args.child:
+        export, export_format = args.child.split(":")
+        print(json.dumps(run_child(args.db, export, export_format, args.rows)))
+        return
+
+    path = os.path.join(common.SCRATCH_DIR, "bench_export.db")
+    started = time.perf_counter()
+    build_table(path, args.rows)
+    print(f"built {args.rows} rows in {time.perf_counter() - started:.1f}s ({os.path.getsize(path) / 1024 / 1024:.0f}MB)")
+
+    for export in EXPORTS:
+        for export_format in FORMATS:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", f"{export}:{export_format}", "--db", path, "--rows", str(args.rows)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print("{export:>6} {format:>5}: first byte {first_byte_s}s, total {total_s}s, {size_mb}MB, "
+                  "RSS growth per quarter {rss_growth_mb_per_quarter}MB, peak +{peak_over_baseline_mb}MB".format(**result))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--child")
+    parser.add_argument("--db")
+    main(parser.parse_args())
@@ -0,0 +1,77 @@
+"""
+بنچمارک فیلتر مخاطبین تکراری (user-003)
+
+    python benchmarks/bench_filter_contacts.py [--sizes 1000 10000 100000]
+
+برای هر اندازه جدول added_contacts با همان تعداد مخاطب پر می‌شود و فایل ورودی نیمی مخاطب موجود،
+نیمی جدید و چند ردیف تکراری داخل خود فایل دارد. روش قبلی (یک اتصال تازه و یک کوئری برای هر ردیف،
+مانند is_contact_exists پیش از user-002) با Database.filter_new_contacts (کوئری‌های IN دسته‌ای روی
+اتصال ماندگار) مقایسه می‌شود.
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+import common
+from database import Database
+
+
+def is_contact_exists_before(path, phone):
+    """روش قبلی is_contact_exists: اتصال تازه برای هر بررسی"""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    result = conn.execute('SELECT id FROM added_contacts WHERE phone = ?', (phone,)).fetchone()
+    conn.close()
+    return result is not None
+
+
+def loop_filter(path, contacts_list):
+    """روش قبلی filter_new_contacts: یک اتصال و یک کوئری برای هر ردیف"""
+    new_contacts = []
+    duplicate_count = 0
+    for contact in contacts_list:
+        phone = contact.get('phone', '')
+        if phone and not is_contact_exists_before(path, phone):
+            new_contacts.append(contact)
+        else:
+            duplicate_count += 1
+    return new_contacts, duplicate_count
+
+
+def build(size):
+    path = os.path.join(common.SCRATCH_DIR, f"contacts_{size}.db")
+    database = Database(path)
+    conn = database.get_connection()
+    conn.executemany(
+        'INSERT INTO added_contacts (name, phone) VALUES (?, ?)',
+        ((f"مخاطب {i}", f"0912{i:07d}") for i in range(0, 2 * size, 2))
+    )
+    conn.commit()
+    contacts = [{"name": f"ورودی {i}", "phone": f"0912{i:07d}"} for i in range(size)]
+    contacts += contacts[:size // 100]
+    return path, database, contacts
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def main(args):
+    for size in args.sizes:
+        path, database, contacts = build(size)
+        loop_time, (loop_new, _) = timed(loop_filter, path, contacts)
+        bulk_time, (bulk_new, bulk_duplicates) = timed(database.filter_new_contacts, contacts)
+        database.close()
+        print(f"{size:>7} rows: loop {loop_time * 1000:8.1f}ms  bulk {bulk_time * 1000:7.1f}ms  "
+              f"({loop_time / bulk_time:.1f}x)  new {len(bulk_new)} (loop kept {len(loop_new)} incl. in-file repeats), "
+              f"duplicates {bulk_duplicates}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    main(parser.parse_args())
@@ -0,0 +1,71 @@
+"""
+بنچمارک حالت سبک (user-016): تاخیر هر پیام و حافظه‌ی مرورگر با LEAN_MODE روشن و خاموش
+روی صفحه‌ی محلی شبیه ایتا (tests/mock_eitaa) که آواتار و فونت سنگین دارد.
+
+    python benchmarks/bench_lean_mode.py [--messages 40] [--asset-latency 0.02] [--asset-kb 64]
+
+هر حالت در یک مرورگر تازه اجرا می‌شود. حافظه مجموع RSS همه‌ی پردازه‌های Chromium است و
+هزینه‌ی route پایتونی حالت سبک (یک رفت و برگشت برای هر درخواست) در تاخیرها دیده می‌شود.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import common
+from playwright.async_api import async_playwright
+
+from mock_eitaa.server import MockEitaaServer
+from src import browser_ops
+
+
+async def run_profile(server, lean, messages):
+    browser_ops.LEAN_MODE = lean
+    requests_before = server.asset_requests
+    async with async_playwright() as playwright:
+        browser = await common.launch_chromium(playwright)
+        context = await browser_ops.new_account_context(browser)
+        page = await context.new_page()
+
+        started = time.perf_counter()
+        await page.goto(server.url)
+        await page.wait_for_load_state("load")
+        load_time = time.perf_counter() - started
+
+        latencies = []
+        for i in range(messages):
+            started = time.perf_counter()
+            success, message, _ = await browser_ops.send_direct_message(
+                page, f"@lean{int(lean)}user{i}", "سلام", "bench", "+98")
+            latencies.append(time.perf_counter() - started)
+            if not success:
+                raise RuntimeError(message)
+
+        rss = common.tree_rss_mb()
+        await browser.close()
+
+    return {
+        "profile": "lean" if lean else "full",
+        "load_s": load_time,
+        "median_ms": statistics.median(latencies) * 1000,
+        "p95_ms": common.percentile(latencies, 0.95) * 1000,
+        "rss_mb": rss,
+        "asset_requests": server.asset_requests - requests_before,
+    }
+
+
+async def main(args):
+    with MockEitaaServer(asset_latency=args.asset_latency, asset_size=args.asset_kb * 1024) as server:
+        for lean in (False, True):
+            result = await run_profile(server, lean, args.messages)
+            print("{profile:>5}: load {load_s:.2f}s, per message median {median_ms:.0f}ms / p95 {p95_ms:.0f}ms, "
+                  "RSS {rss_mb:.0f}MB, asset requests {asset_requests}".format(**result))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--asset-latency", type=float, default=0.02)
+    parser.add_argument("--asset-kb", type=int, default=64)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,62 @@
+"""
+ابزارهای مشترک بنچمارک‌ها
+
+هر اسکریپت از ریشه‌ی مخزن با python benchmarks/<name>.py اجرا می‌شود. وارد کردن این ماژول
+پوشه‌ی جاری را به یک پوشه‌ی موقت می‌برد تا eitaa_bot.db و لاگ‌های بنچمارک کنار کد ساخته نشوند.
+"""
+
+import os
+import resource
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix="eitabot-bench-")
+os.chdir(SCRATCH_DIR)
+
+
+def peak_rss_mb():
+    """بیشینه‌ی حافظه‌ی مقیم همین پردازه (مگابایت)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def tree_rss_mb(pid=None):
+    """مجموع حافظه‌ی مقیم یک پردازه و همه‌ی فرزندانش (مثلاً پردازه‌های Chromium) - فقط لینوکس"""
+    total_kb = 0
+    stack = [pid or os.getpid()]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+                        break
+        except OSError:
+            continue
+        stack.extend(_children(current))
+    return total_kb / 1024
+
+
+async def launch_chromium(playwright, headless=True):
+    """اجرای Chromium یا خروج با پیام روشن در صورت نصب نبودن آن"""
+    try:
+        return await playwright.chromium.launch(headless=headless)
+    except Exception as e:
+        sys.exit(f"Chromium در دسترس نیست (python -m playwright install chromium): {str(e).splitlines()[0]}")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
@@ -1,18 +1,203 @@
 import sqlite3
 import json
+import hashlib
+import threading
 from datetime import datetime
 
+# طول ذخیره شده‌ی متن پیام در dispatch_reports
+REPORT_MESSAGE_LENGTH = 500
+
+# دلیل کنار گذاشتن هدف کمپین (state = 'skipped')
+SKIP_REASON_SENT = 'این پیام قبلاً برای گیرنده ارسال شده'
+SKIP_REASON_FAILED = 'خطای دائمی در کمپین قبلی'
+
+def recipient_key(user_id):
+    """کلید یکتای گیرنده (بدون @ و با حروف کوچک)"""
+    return (user_id or "").strip().lstrip('@').lower()
+
+def message_hash(message_content):
+    """هش متن پیام برای ایندکس جلوگیری از ارسال تکراری"""
+    return hashlib.sha256((message_content or "").encode('utf-8')).hexdigest()
+
+def targets_hash(user_ids):
+    """هش مجموعه‌ی گیرندگان یک کمپین (مستقل از ترتیب و تکرار) برای تشخیص ادامه‌ی همان لیست"""
+    keys = sorted({recipient_key(u) for u in user_ids})
+    return hashlib.sha256("\n".join(keys).encode('utf-8')).hexdigest()
+
+def _backfill_sent_messages(conn):
+    # فقط گزارش‌هایی که متنشان کوتاه‌تر از حد ذخیره است (بریده نشده) قابل هش کردن‌اند
+    rows = conn.execute(
+        "SELECT DISTINCT user_id, message_content FROM dispatch_reports WHERE status = 'success' AND length(message_content) < ?",
+        (REPORT_MESSAGE_LENGTH,)
+    )
+    conn.executemany(
+        'INSERT OR IGNORE INTO sent_messages (message_hash, user_key) VALUES (?, ?)',
+        ((message_hash(row['message_content']), recipient_key(row['user_id'])) for row in rows)
+    )
+    conn.executemany(
+        'UPDATE campaigns SET message_hash = ? WHERE id = ?',
+        [(message_hash(row['message_content']), row['id']) for row in conn.execute('SELECT id, message_content FROM campaigns')]
+    )
+
 class Database:
-    def __init__(self, db_name="eitaa_bot.db"):
+    # مهاجرت‌های اسکیما به ترتیب؛ شماره نسخه در PRAGMA user_version نگه‌داری می‌شود
+    SCHEMA_MIGRATIONS = [
+        # 1: ایندکس‌های ترکیبی تا فیلتر وضعیت/نوع عملیات/شماره همراه با بازه‌ی زمانی از ایندکس استفاده کند
+        [
+            'CREATE INDEX IF NOT EXISTS idx_reports_status_timestamp ON dispatch_reports(status, timestamp)',
+            'CREATE INDEX IF NOT EXISTS idx_reports_operation_timestamp ON dispatch_reports(operation_type, timestamp)',
+            'CREATE INDEX IF NOT EXISTS idx_reports_phone_timestamp ON dispatch_reports(phone_number, timestamp)',
+            'ANALYZE dispatch_reports',
+        ],
+        # 2: شمارنده‌های روزانه که با تریگر به‌روز می‌شوند تا آمار داشبورد مستقل از حجم جدول‌ها باشد
+        [
+            '''CREATE TABLE IF NOT EXISTS contacts_daily_stats (
+                day TEXT PRIMARY KEY,
+                count INTEGER NOT NULL DEFAULT 0
+            )''',
+            '''CREATE TABLE IF NOT EXISTS dispatch_daily_stats (
+                day TEXT NOT NULL,
+                status TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, status)
+            )''',
+            '''CREATE TRIGGER IF NOT EXISTS trg_contacts_stats_insert AFTER INSERT ON added_contacts
+            BEGIN
+                INSERT INTO contacts_daily_stats (day, count) VALUES (COALESCE(date(NEW.added_date), ''), 1)
+                ON CONFLICT(day) DO UPDATE SET count = count + 1;
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS trg_contacts_stats_delete AFTER DELETE ON added_contacts
+            BEGIN
+                UPDATE contacts_daily_stats SET count = count - 1 WHERE day = COALESCE(date(OLD.added_date), '');
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS trg_dispatch_stats_insert AFTER INSERT ON dispatch_reports
+            BEGIN
+                INSERT INTO dispatch_daily_stats (day, status, count) VALUES (COALESCE(date(NEW.timestamp), ''), NEW.status, 1)
+                ON CONFLICT(day, status) DO UPDATE SET count = count + 1;
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS trg_dispatch_stats_delete AFTER DELETE ON dispatch_reports
+            BEGIN
+                UPDATE dispatch_daily_stats SET count = count - 1
+                WHERE day = COALESCE(date(OLD.timestamp), '') AND status = OLD.status;
+            END''',
+            'DELETE FROM contacts_daily_stats',
+            'DELETE FROM dispatch_daily_stats',
+            '''INSERT INTO contacts_daily_stats (day, count)
+            SELECT COALESCE(date(added_date), ''), COUNT(*) FROM added_contacts GROUP BY 1''',
+            '''INSERT INTO dispatch_daily_stats (day, status, count)
+            SELECT COALESCE(date(timestamp), ''), status, COUNT(*) FROM dispatch_reports GROUP BY 1, 2''',
+        ],
+        # 3: کش نام کاربری -> شناسه‌ی گفتگو تا ارسال بعدی بدون جستجو انجام شود
+        [
+            '''CREATE TABLE IF NOT EXISTS peer_cache (
+                username TEXT PRIMARY KEY,
+                peer_id TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )''',
+        ],
+        # 4: آخرین پیام بررسی شده‌ی هر گروه (به ازای پیشوند) تا اجرای بعدی فقط پیام‌های جدیدتر را بخواند
+        [
+            '''CREATE TABLE IF NOT EXISTS group_scan_marks (
+                group_name TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                last_mid REAL NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (group_name, keyword)
+            )''',
+        ],
+        # 5: صف ماندگار ارسال کمپین‌ها تا اجرای دوباره از همان جای توقف ادامه دهد
+        [
+            '''CREATE TABLE IF NOT EXISTS campaigns (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                operation_type TEXT NOT NULL,
+                message_content TEXT NOT NULL,
+                phone_number TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'running',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )''',
+            '''CREATE TABLE IF NOT EXISTS campaign_targets (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                campaign_id INTEGER NOT NULL REFERENCES campaigns(id),
+                user_id TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                error_message TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (campaign_id, user_id)
+            )''',
+            'CREATE INDEX IF NOT EXISTS idx_campaigns_lookup ON campaigns(operation_type, phone_number, status)',
+            'CREATE INDEX IF NOT EXISTS idx_campaign_targets_state ON campaign_targets(campaign_id, state, id)',
+        ],
+        # 6: ایندکس (هش پیام، گیرنده) برای حذف گیرندگانی که همین پیام را قبلاً دریافت کرده‌اند
+        [
+            '''CREATE TABLE IF NOT EXISTS sent_messages (
+                message_hash TEXT NOT NULL,
+                user_key TEXT NOT NULL,
+                sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (message_hash, user_key)
+            ) WITHOUT ROWID''',
+            'ALTER TABLE campaigns ADD COLUMN message_hash TEXT',
+            'ALTER TABLE campaigns ADD COLUMN skipped_count INTEGER NOT NULL DEFAULT 0',
+            _backfill_sent_messages,
+        ],
+        # 7: صف تلاش مجدد خطاهای گذرا و فهرست گیرندگانی که خطای دائمی داشته‌اند
+        [
+            'ALTER TABLE campaign_targets ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0',
+            'ALTER TABLE campaign_targets ADD COLUMN failure_kind TEXT',
+            '''CREATE TABLE IF NOT EXISTS failed_recipients (
+                user_key TEXT PRIMARY KEY,
+                failure_kind TEXT NOT NULL,
+                error_message TEXT,
+                failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) WITHOUT ROWID''',
+        ],
+        # 8: کمپین فقط برای همان لیست گیرندگان ادامه داده می‌شود، نه برای هر اجرای دیگری با همان پیام
+        [
+            'ALTER TABLE campaigns ADD COLUMN targets_hash TEXT',
+        ],
+    ]
+    
+    def __init__(self, db_name="eitaa_bot.db", cache_size_kb=16000, cached_statements=256):
         self.db_name = db_name
+        self.cache_size_kb = cache_size_kb
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
         self.init_database()
     
-    def get_connection(self):
-        """ایجاد اتصال به دیتابیس"""
-        conn = sqlite3.connect(self.db_name, check_same_thread=False)
+    def _open_connection(self):
+        """ایجاد اتصال جدید با تنظیمات کارایی"""
+        conn = sqlite3.connect(self.db_name, check_same_thread=False, cached_statements=self.cached_statements)
         conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA busy_timeout=5000')
         return conn
     
+    def get_connection(self):
+        """اتصال ماندگار به دیتابیس (یک اتصال برای هر ترد)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open_connection()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def close(self):
+        """بستن تمام اتصال‌های باز"""
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+    
     def init_database(self):
         """ایجاد جداول مورد نیاز"""
         conn = self.get_connection()
@@ -49,7 +234,33 @@ class Database:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_reports_timestamp ON dispatch_reports(timestamp)')
         
         conn.commit()
-        conn.close()
+        self.migrate_schema()
+    
+    def migrate_schema(self):
+        """اجرای مهاجرت‌های اسکیمای اعمال‌نشده روی فایل دیتابیس موجود"""
+        conn = self.get_connection()
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        
+        # sqlite3 دستورهای CREATE/ALTER را خارج از تراکنش فوراً commit می‌کند؛
+        # پس هر مهاجرت در یک BEGIN ... COMMIT صریح اجرا می‌شود تا شکست آن چیزی از اسکیما باقی نگذارد
+        isolation_level = conn.isolation_level
+        conn.isolation_level = None
+        try:
+            for target_version, statements in enumerate(self.SCHEMA_MIGRATIONS[version:], start=version + 1):
+                conn.execute('BEGIN')
+                try:
+                    for statement in statements:
+                        if callable(statement):
+                            statement(conn)
+                        else:
+                            conn.execute(statement)
+                    conn.execute(f'PRAGMA user_version = {target_version}')
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+        finally:
+            conn.isolation_level = isolation_level
     
     def is_contact_exists(self, phone):
         """بررسی وجود مخاطب در دیتابیس"""
@@ -58,14 +269,12 @@ class Database:
         
         cursor.execute('SELECT id FROM added_contacts WHERE phone = ?', (phone,))
         result = cursor.fetchone()
-        
-        conn.close()
         return result is not None
     
     def add_contact(self, name, phone, added_by_phone=None):
         """اضافه کردن مخاطب جدید به دیتابیس"""
+        conn = self.get_connection()
         try:
-            conn = self.get_connection()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -74,23 +283,45 @@ class Database:
             ''', (name, phone, added_by_phone))
             
             conn.commit()
-            conn.close()
             return True
         except Exception as e:
+            conn.rollback()
             print(f"Error adding contact to database: {e}")
             return False
     
+    def get_existing_phones(self, phones, chunk_size=500):
+        """دریافت شماره‌های موجود در دیتابیس از میان لیست داده شده (پرس‌وجوی دسته‌ای)"""
+        phones = list(phones)
+        existing = set()
+        if not phones:
+            return existing
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        for start in range(0, len(phones), chunk_size):
+            chunk = phones[start:start + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'SELECT phone FROM added_contacts WHERE phone IN ({placeholders})', chunk)
+            existing.update(row['phone'] for row in cursor.fetchall())
+        
+        return existing
+    
     def filter_new_contacts(self, contacts_list, added_by_phone=None):
-        """فیلتر کردن مخاطبین جدید (غیرتکراری)"""
+        """فیلتر کردن مخاطبین جدید (غیرتکراری در دیتابیس و داخل خود فایل)"""
         new_contacts = []
         duplicate_count = 0
         
+        candidate_phones = {contact.get('phone', '') for contact in contacts_list}
+        candidate_phones.discard('')
+        seen_phones = self.get_existing_phones(candidate_phones)
+        
         for contact in contacts_list:
             phone = contact.get('phone', '')
-            name = contact.get('name', '')
             
-            if phone and not self.is_contact_exists(phone):
+            if phone and phone not in seen_phones:
                 new_contacts.append(contact)
+                seen_phones.add(phone)
             else:
                 duplicate_count += 1
         
@@ -98,8 +329,8 @@ class Database:
     
     def save_dispatch_report(self, user_id, status, error_message, operation_type, message_content, phone_number):
         """ذخیره گزارش ارسال در دیتابیس"""
+        conn = self.get_connection()
         try:
-            conn = self.get_connection()
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -108,85 +339,488 @@ class Database:
             ''', (user_id, status, error_message or "", operation_type or "", message_content or "", phone_number or ""))
             
             conn.commit()
-            conn.close()
             return True
         except Exception as e:
+            conn.rollback()
             print(f"Error saving dispatch report: {e}")
             return False
     
-    def get_dispatch_reports(self, limit=100, offset=0, status_filter=None, date_filter=None):
-        """دریافت گزارش‌های ارسال"""
+    def save_dispatch_reports(self, reports):
+        """ذخیره دسته‌ای گزارش‌های ارسال در یک تراکنش"""
+        if not reports:
+            return True
+        conn = self.get_connection()
+        try:
+            conn.executemany('''
+                INSERT INTO dispatch_reports (user_id, status, error_message, operation_type, message_content, phone_number)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [
+                (r['user_id'], r['status'], r.get('error_message') or "", r.get('operation_type') or "",
+                 r.get('message_content') or "", r.get('phone_number') or "")
+                for r in reports
+            ])
+            conn.commit()
+            return True
+        except Exception as e:
+            conn.rollback()
+            print(f"Error saving dispatch reports batch: {e}")
+            return False
+    
+    def get_peer_ids(self, usernames, chunk_size=500):
+        """شناسه‌ی گفتگوی ذخیره شده برای نام‌های کاربری داده شده (بدون @ و با حروف کوچک)"""
+        usernames = list(usernames)
+        peers = {}
+        if not usernames:
+            return peers
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        query = 'SELECT * FROM dispatch_reports'
-        params = []
+        for start in range(0, len(usernames), chunk_size):
+            chunk = usernames[start:start + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'SELECT username, peer_id FROM peer_cache WHERE username IN ({placeholders})', chunk)
+            peers.update((row['username'], row['peer_id']) for row in cursor.fetchall())
+        
+        return peers
+    
+    def save_peer_id(self, username, peer_id):
+        """ذخیره یا به‌روزرسانی شناسه‌ی گفتگوی یک نام کاربری"""
+        conn = self.get_connection()
+        try:
+            conn.execute('''
+                INSERT INTO peer_cache (username, peer_id) VALUES (?, ?)
+                ON CONFLICT(username) DO UPDATE SET peer_id = excluded.peer_id, updated_at = CURRENT_TIMESTAMP
+            ''', (username, peer_id))
+            conn.commit()
+            return True
+        except Exception as e:
+            conn.rollback()
+            print(f"Error saving peer id: {e}")
+            return False
+    
+    def delete_peer_id(self, username):
+        """حذف شناسه‌ی نامعتبر از کش"""
+        conn = self.get_connection()
+        conn.execute('DELETE FROM peer_cache WHERE username = ?', (username,))
+        conn.commit()
+    
+    def get_scan_mark(self, group_name, keyword):
+        """شناسه‌ی آخرین پیام بررسی شده‌ی گروه برای این پیشوند (۰ اگر تاکنون بررسی نشده)"""
+        conn = self.get_connection()
+        row = conn.execute(
+            'SELECT last_mid FROM group_scan_marks WHERE group_name = ? AND keyword = ?',
+            (group_name, keyword or "")
+        ).fetchone()
+        return row['last_mid'] if row else 0
+    
+    def save_scan_mark(self, group_name, keyword, last_mid):
+        """ذخیره‌ی شناسه‌ی آخرین پیام بررسی شده‌ی گروه"""
+        conn = self.get_connection()
+        try:
+            conn.execute('''
+                INSERT INTO group_scan_marks (group_name, keyword, last_mid) VALUES (?, ?, ?)
+                ON CONFLICT(group_name, keyword) DO UPDATE SET
+                    last_mid = MAX(last_mid, excluded.last_mid), updated_at = CURRENT_TIMESTAMP
+            ''', (group_name, keyword or "", last_mid))
+            conn.commit()
+            return True
+        except Exception as e:
+            conn.rollback()
+            print(f"Error saving scan mark: {e}")
+            return False
+    
+    def filter_unsent_recipients(self, user_ids, message_content, chunk_size=500):
+        """حذف گیرندگانی که همین پیام قبلاً با موفقیت برایشان ارسال شده. خروجی: (گیرندگان باقی‌مانده، تعداد حذف شده)"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return user_ids, 0
+        
+        digest = message_hash(message_content)
+        keys = list({recipient_key(u) for u in user_ids})
+        served = set()
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(
+                f'SELECT user_key FROM sent_messages WHERE message_hash = ? AND user_key IN ({placeholders})',
+                [digest] + chunk
+            )
+            served.update(row['user_key'] for row in cursor.fetchall())
+        
+        remaining = [u for u in user_ids if recipient_key(u) not in served]
+        return remaining, len(user_ids) - len(remaining)
+    
+    def filter_permanent_failures(self, user_ids, chunk_size=500):
+        """حذف گیرندگانی که قبلاً خطای دائمی (مثلاً کاربر ناموجود) داشته‌اند. خروجی: (گیرندگان باقی‌مانده، تعداد حذف شده)"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return user_ids, 0
+        
+        keys = list({recipient_key(u) for u in user_ids})
+        failed = set()
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'SELECT user_key FROM failed_recipients WHERE user_key IN ({placeholders})', chunk)
+            failed.update(row['user_key'] for row in cursor.fetchall())
+        
+        remaining = [u for u in user_ids if recipient_key(u) not in failed]
+        return remaining, len(user_ids) - len(remaining)
+    
+    def start_campaign(self, operation_type, message_content, phone_number, user_ids, skipped=(), list_hash=None):
+        """ایجاد کمپین، یا ادامه‌ی کمپین ناتمام با همان نوع عملیات، پیام، شماره و لیست گیرندگان (list_hash).
+        list_hash هش لیست اصلی پیش از حذف تکراری‌هاست؛ در صورت نبود از user_ids محاسبه می‌شود.
+        skipped زوج‌های (گیرنده، دلیل) حذف شده پیش از شروع است که مانند حذف‌های هنگام برداشتن هدف
+        با وضعیت skipped ثبت و به skipped_count افزوده می‌شوند؛ گیرندگانی که همین کمپین قبلاً داشته دوباره شمرده نمی‌شوند.
+        اهداف جدید به صف اضافه و اهداف in_flight رها شده به pending برگردانده می‌شوند. خروجی: (شناسه، ادامه‌ی کمپین قبلی؟)"""
+        list_hash = list_hash or targets_hash(user_ids)
+        conn = self.get_connection()
+        try:
+            row = conn.execute('''
+                SELECT id FROM campaigns
+                WHERE operation_type = ? AND phone_number = ? AND message_content = ? AND targets_hash = ?
+                  AND status != 'completed'
+                ORDER BY id DESC LIMIT 1
+            ''', (operation_type, phone_number or "", message_content or "", list_hash)).fetchone()
+            
+            if row:
+                campaign_id = row['id']
+                conn.execute(
+                    "UPDATE campaigns SET status = 'running', updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    (campaign_id,)
+                )
+                conn.execute(
+                    "UPDATE campaign_targets SET state = 'pending' WHERE campaign_id = ? AND state = 'in_flight'",
+                    (campaign_id,)
+                )
+            else:
+                cursor = conn.execute(
+                    'INSERT INTO campaigns (operation_type, message_content, phone_number, message_hash, targets_hash) VALUES (?, ?, ?, ?, ?)',
+                    (operation_type, message_content or "", phone_number or "", message_hash(message_content), list_hash)
+                )
+                campaign_id = cursor.lastrowid
+            
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO campaign_targets (campaign_id, user_id, state, error_message) VALUES (?, ?, 'skipped', ?)",
+                [(campaign_id, user_id, reason) for user_id, reason in skipped]
+            )
+            if cursor.rowcount > 0:
+                conn.execute('UPDATE campaigns SET skipped_count = skipped_count + ? WHERE id = ?', (cursor.rowcount, campaign_id))
+            
+            conn.executemany(
+                'INSERT OR IGNORE INTO campaign_targets (campaign_id, user_id) VALUES (?, ?)',
+                [(campaign_id, user_id) for user_id in user_ids]
+            )
+            conn.commit()
+            return campaign_id, row is not None
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def _skip_if_served(self, conn, campaign_id, user_id):
+        """هدفی که گیرنده‌اش همین پیام را (در هر کمپین یا حسابی) گرفته یا خطای دائمی داشته skipped می‌شود؛ خروجی True در این صورت"""
+        key = recipient_key(user_id)
+        row = conn.execute('''
+            SELECT ? AS reason FROM sent_messages
+            WHERE user_key = ? AND message_hash = (SELECT message_hash FROM campaigns WHERE id = ?)
+            UNION ALL
+            SELECT ? || ': ' || failure_kind FROM failed_recipients WHERE user_key = ?
+            LIMIT 1
+        ''', (SKIP_REASON_SENT, key, campaign_id, SKIP_REASON_FAILED, key)).fetchone()
+        if row is None:
+            return False
+        conn.execute('''
+            UPDATE campaign_targets SET state = 'skipped', error_message = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE campaign_id = ? AND user_id = ?
+        ''', (row['reason'], campaign_id, user_id))
+        conn.execute('UPDATE campaigns SET skipped_count = skipped_count + 1 WHERE id = ?', (campaign_id,))
+        return True
+    
+    def claim_campaign_target(self, campaign_id):
+        """برداشتن هدف بعدی صف (pending -> in_flight) به صورت اتمی؛ None اگر صف خالی باشد.
+        اهدافی که در این فاصله دریافت‌کننده شده‌اند (مثلاً اهداف ادامه‌ی کمپین یا سهم حساب دیگر) کنار گذاشته می‌شوند"""
+        conn = self.get_connection()
+        try:
+            while True:
+                row = conn.execute('''
+                    UPDATE campaign_targets SET state = 'in_flight', updated_at = CURRENT_TIMESTAMP
+                    WHERE id = (
+                        SELECT id FROM campaign_targets
+                        WHERE campaign_id = ? AND state = 'pending'
+                        ORDER BY id LIMIT 1
+                    )
+                    RETURNING user_id
+                ''', (campaign_id,)).fetchone()
+                if row is None or not self._skip_if_served(conn, campaign_id, row['user_id']):
+                    break
+            conn.commit()
+            return row['user_id'] if row else None
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def claim_retry_target(self, campaign_id):
+        """برداشتن قدیمی‌ترین هدف صف تلاش مجدد (retry -> in_flight).
+        خروجی: دیکشنری user_id، failure_kind، attempts و elapsed (ثانیه از آخرین خطا) یا None"""
+        conn = self.get_connection()
+        try:
+            while True:
+                # updated_at عمداً تغییر نمی‌کند تا زمان سپری شده از آخرین خطا قابل محاسبه باشد
+                row = conn.execute('''
+                    UPDATE campaign_targets SET state = 'in_flight'
+                    WHERE id = (
+                        SELECT id FROM campaign_targets
+                        WHERE campaign_id = ? AND state = 'retry'
+                        ORDER BY updated_at, id LIMIT 1
+                    )
+                    RETURNING user_id, failure_kind, attempts,
+                              (julianday('now') - julianday(updated_at)) * 86400 AS elapsed
+                ''', (campaign_id,)).fetchone()
+                if row is None or not self._skip_if_served(conn, campaign_id, row['user_id']):
+                    break
+            conn.commit()
+            return dict(row) if row else None
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def complete_campaign_target(self, campaign_id, user_id, state, error_message=None, failure_kind=None, permanent=False):
+        """ثبت نتیجه‌ی ارسال یک هدف (sent/failed/retry) یا بازگرداندن آن به صف (pending/retry).
+        با failure_kind یک تلاش ناموفق شمرده می‌شود؛ permanent گیرنده را برای کمپین‌های بعدی کنار می‌گذارد"""
+        conn = self.get_connection()
+        try:
+            conn.execute('''
+                UPDATE campaign_targets
+                SET state = ?, error_message = COALESCE(?, error_message), failure_kind = COALESCE(?, failure_kind),
+                    attempts = attempts + (? IS NOT NULL), updated_at = CURRENT_TIMESTAMP
+                WHERE campaign_id = ? AND user_id = ?
+            ''', (state, error_message, failure_kind, failure_kind, campaign_id, user_id))
+            if state == 'sent':
+                conn.execute('''
+                    INSERT OR IGNORE INTO sent_messages (message_hash, user_key)
+                    SELECT message_hash, ? FROM campaigns WHERE id = ?
+                ''', (recipient_key(user_id), campaign_id))
+            elif permanent:
+                conn.execute(
+                    'INSERT OR REPLACE INTO failed_recipients (user_key, failure_kind, error_message) VALUES (?, ?, ?)',
+                    (recipient_key(user_id), failure_kind, error_message)
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def get_campaign_progress(self, campaign_id):
+        """تعداد اهداف کمپین به تفکیک وضعیت"""
+        conn = self.get_connection()
+        rows = conn.execute(
+            'SELECT state, COUNT(*) AS count FROM campaign_targets WHERE campaign_id = ? GROUP BY state',
+            (campaign_id,)
+        ).fetchall()
+        progress = {'pending': 0, 'in_flight': 0, 'retry': 0, 'sent': 0, 'failed': 0, 'skipped': 0}
+        progress.update((row['state'], row['count']) for row in rows)
+        return progress
+    
+    def get_recent_campaigns(self, limit=20):
+        """آخرین کمپین‌ها همراه با تعداد اهداف به تفکیک وضعیت و تعداد حذف شده‌های تکراری"""
+        conn = self.get_connection()
+        rows = conn.execute('''
+            SELECT c.id, c.operation_type, c.phone_number, c.status, c.skipped_count, c.created_at, c.updated_at,
+                   COALESCE(SUM(t.state = 'pending'), 0) AS pending,
+                   COALESCE(SUM(t.state = 'in_flight'), 0) AS in_flight,
+                   COALESCE(SUM(t.state = 'retry'), 0) AS retry,
+                   COALESCE(SUM(t.state = 'sent'), 0) AS sent,
+                   COALESCE(SUM(t.state = 'failed'), 0) AS failed
+            FROM (SELECT * FROM campaigns ORDER BY id DESC LIMIT ?) c
+            LEFT JOIN campaign_targets t ON t.campaign_id = c.id
+            GROUP BY c.id
+            ORDER BY c.id DESC
+        ''', (limit,)).fetchall()
+        return [dict(row) for row in rows]
+    
+    def finish_campaign(self, campaign_id):
+        """بستن کمپین: completed اگر هدف باقی‌مانده (pending یا retry) نباشد، وگرنه stopped"""
+        conn = self.get_connection()
+        try:
+            conn.execute(
+                "UPDATE campaign_targets SET state = 'pending' WHERE campaign_id = ? AND state = 'in_flight'",
+                (campaign_id,)
+            )
+            remaining = conn.execute(
+                "SELECT COUNT(*) FROM campaign_targets WHERE campaign_id = ? AND state IN ('pending', 'retry')",
+                (campaign_id,)
+            ).fetchone()[0]
+            status = 'stopped' if remaining else 'completed'
+            conn.execute(
+                'UPDATE campaigns SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                (status, campaign_id)
+            )
+            conn.commit()
+            return status
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def _dispatch_report_conditions(self, status=None, operation_type=None, phone_number=None, date_from=None, date_to=None):
+        """ساخت شرط‌های فیلتر گزارش‌ها (تاریخ‌ها به صورت YYYY-MM-DD)"""
         conditions = []
-        if status_filter:
+        params = []
+        if status:
             conditions.append('status = ?')
-            params.append(status_filter)
-        if date_filter:
-            conditions.append('DATE(timestamp) = ?')
-            params.append(date_filter)
+            params.append(status)
+        if operation_type:
+            conditions.append('operation_type = ?')
+            params.append(operation_type)
+        if phone_number:
+            conditions.append('phone_number = ?')
+            params.append(phone_number)
+        if date_from:
+            conditions.append('timestamp >= ?')
+            params.append(date_from)
+        if date_to:
+            conditions.append("timestamp < date(?, '+1 day')")
+            params.append(date_to)
+        return conditions, params
+    
+    def _dispatch_reports_query(self, limit=100, cursor=None, status=None, operation_type=None, phone_number=None, date_from=None, date_to=None):
+        """کوئری یک صفحه از گزارش‌ها (یک سطر بیشتر از limit برای تشخیص صفحه‌ی بعد)؛ خروجی (query, params)"""
+        conditions, params = self._dispatch_report_conditions(status, operation_type, phone_number, date_from, date_to)
+        
+        if cursor:
+            try:
+                cursor_timestamp, cursor_id = cursor.rsplit('|', 1)
+                cursor_id = int(cursor_id)
+            except ValueError:
+                raise ValueError(f"cursor نامعتبر: {cursor}")
+            conditions.append('(timestamp, id) < (?, ?)')
+            params.extend([cursor_timestamp, cursor_id])
         
+        query = 'SELECT * FROM dispatch_reports'
         if conditions:
             query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY timestamp DESC, id DESC LIMIT ?'
+        params.append(limit + 1)
+        return query, params
+    
+    def get_dispatch_reports(self, limit=100, cursor=None, status=None, operation_type=None, phone_number=None, date_from=None, date_to=None):
+        """دریافت گزارش‌های ارسال با صفحه‌بندی کلیدی روی (timestamp, id)
         
-        query += ' ORDER BY timestamp DESC LIMIT ? OFFSET ?'
-        params.extend([limit, offset])
-        
-        cursor.execute(query, params)
-        reports = [dict(row) for row in cursor.fetchall()]
+        cursor مقدار next_cursor صفحه‌ی قبلی است؛ خروجی (reports, next_cursor)
+        """
+        conn = self.get_connection()
+        cursor_db = conn.cursor()
+        query, params = self._dispatch_reports_query(limit, cursor, status, operation_type, phone_number, date_from, date_to)
         
-        # تعداد کل رکوردها
-        count_query = 'SELECT COUNT(*) as count FROM dispatch_reports'
-        if conditions:
-            count_query += ' WHERE ' + ' AND '.join(conditions)
-            cursor.execute(count_query, params[:-2])
-        else:
-            cursor.execute(count_query)
+        cursor_db.execute(query, params)
+        reports = [dict(row) for row in cursor_db.fetchall()]
         
-        total_count = cursor.fetchone()['count']
+        next_cursor = None
+        if len(reports) > limit:
+            reports = reports[:limit]
+            last = reports[-1]
+            next_cursor = f"{last['timestamp']}|{last['id']}"
         
-        conn.close()
-        return reports, total_count
+        return reports, next_cursor
     
-    def get_all_dispatch_reports(self):
-        """دریافت تمام گزارش‌های ارسال"""
+    def get_dispatch_summary(self, status=None, operation_type=None, phone_number=None, date_from=None, date_to=None):
+        """شمارش گزارش‌ها به تفکیک وضعیت با همان فیلترهای صفحه‌بندی"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM dispatch_reports ORDER BY timestamp DESC')
-        reports = [dict(row) for row in cursor.fetchall()]
+        is_day = lambda value: not value or len(value) == 10
+        if not operation_type and not phone_number and is_day(date_from) and is_day(date_to):
+            # فقط فیلتر وضعیت/روز: از شمارنده‌های روزانه خوانده می‌شود
+            conditions = []
+            params = []
+            if status:
+                conditions.append('status = ?')
+                params.append(status)
+            if date_from:
+                conditions.append('day >= ?')
+                params.append(date_from)
+            if date_to:
+                conditions.append('day <= ?')
+                params.append(date_to)
+            query = 'SELECT status, SUM(count) as count FROM dispatch_daily_stats'
+        else:
+            conditions, params = self._dispatch_report_conditions(status, operation_type, phone_number, date_from, date_to)
+            query = 'SELECT status, COUNT(*) as count FROM dispatch_reports'
         
-        conn.close()
-        return reports
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' GROUP BY status'
+        
+        cursor.execute(query, params)
+        summary = {'total': 0, 'success': 0, 'failed': 0, 'skipped': 0}
+        for row in cursor.fetchall():
+            summary[row['status']] = row['count']
+            summary['total'] += row['count']
+        return summary
+    
+    def _iter_query(self, query, params=(), chunk_size=1000):
+        """اجرای کوئری روی اتصال اختصاصی و برگرداندن ردیف‌ها به صورت دسته‌ای
+        
+        اتصال جدا باعث می‌شود خروجی‌های طولانی (که ممکن است در تردهای مختلف ادامه یابند)
+        با تراکنش‌های اتصال مشترک تداخل نداشته باشند.
+        """
+        conn = self._open_connection()
+        try:
+            # مرتب‌سازی و DISTINCT روی میلیون‌ها ردیف به جای حافظه روی دیسک انجام شود
+            conn.execute('PRAGMA temp_store=FILE')
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+    
+    def iter_dispatch_reports(self, chunk_size=1000, status=None, operation_type=None, phone_number=None, date_from=None, date_to=None):
+        """پیمایش جریانی تمام گزارش‌ها (جدیدترین اول) بدون بارگذاری کامل در حافظه"""
+        conditions, params = self._dispatch_report_conditions(status, operation_type, phone_number, date_from, date_to)
+        query = 'SELECT * FROM dispatch_reports'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY timestamp DESC, id DESC'
+        return self._iter_query(query, params, chunk_size)
+    
+    def iter_dispatch_user_ids(self, chunk_size=1000):
+        """پیمایش جریانی آی‌دی‌های یکتای کاربران در گزارش‌ها"""
+        return (row['user_id'] for row in self._iter_query(
+            "SELECT DISTINCT TRIM(user_id) as user_id FROM dispatch_reports WHERE TRIM(user_id) != ''",
+            (), chunk_size
+        ))
     
     def get_contacts_statistics(self):
         """آمار مخاطبین"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT COUNT(*) as total FROM added_contacts')
+        # شماره تلفن در added_contacts یکتاست، پس تعداد کل همان تعداد شماره‌های یکتاست
+        cursor.execute('SELECT COALESCE(SUM(count), 0) as total FROM contacts_daily_stats')
         total = cursor.fetchone()['total']
         
-        cursor.execute('SELECT COUNT(DISTINCT phone) as unique_phones FROM added_contacts')
-        unique = cursor.fetchone()['unique_phones']
-        
         cursor.execute('''
-            SELECT strftime('%Y-%m-%d', added_date) as date, COUNT(*) as count 
-            FROM added_contacts 
-            GROUP BY strftime('%Y-%m-%d', added_date) 
-            ORDER BY date DESC 
+            SELECT day as date, count 
+            FROM contacts_daily_stats 
+            WHERE count > 0 
+            ORDER BY day DESC 
             LIMIT 7
         ''')
         last_7_days = cursor.fetchall()
-        
-        conn.close()
         return {
             'total': total,
-            'unique': unique,
+            'unique': total,
             'last_7_days': [dict(row) for row in last_7_days]
         }
     
@@ -197,14 +831,20 @@ class Database:
         
         if table_name == 'contacts':
             cursor.execute('DELETE FROM added_contacts')
+            cursor.execute('DELETE FROM contacts_daily_stats')
         elif table_name == 'reports':
             cursor.execute('DELETE FROM dispatch_reports')
+            cursor.execute('DELETE FROM dispatch_daily_stats')
+        elif table_name == 'failed_recipients':
+            cursor.execute('DELETE FROM failed_recipients')
         elif table_name is None:
+            cursor.execute('DELETE FROM failed_recipients')
             cursor.execute('DELETE FROM added_contacts')
             cursor.execute('DELETE FROM dispatch_reports')
+            cursor.execute('DELETE FROM contacts_daily_stats')
+            cursor.execute('DELETE FROM dispatch_daily_stats')
         
         conn.commit()
-        conn.close()
     
     def export_contacts_to_csv(self):
         """خروجی گرفتن از مخاطبین به فرمت CSV"""
@@ -213,8 +853,6 @@ class Database:
         
         cursor.execute('SELECT name, phone, added_date, added_by_phone FROM added_contacts ORDER BY added_date DESC')
         contacts = cursor.fetchall()
-        
-        conn.close()
         return contacts
 
 # ایجاد یک نمونه از دیتابیس
@@ -0,0 +1,168 @@
+"""
+ذخیره‌سازی لاگ‌ها به صورت JSONL (هر خط یک رکورد) با نویسنده‌ی async و چرخش فایل
+"""
+
+import os
+import json
+import asyncio
+from datetime import datetime, timedelta
+
+import aiofiles
+
+
+class JsonlLogStore:
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, max_age_days=7, backup_count=5,
+                 batch_size=200, flush_interval=0.5, queue_size=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = timedelta(days=max_age_days) if max_age_days else None
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self._queue = None
+        self._writer_task = None
+        self._file_started_at = None
+
+    async def start(self):
+        """راه‌اندازی نویسنده‌ی پس‌زمینه (یک‌بار در طول عمر برنامه)"""
+        if self._writer_task and not self._writer_task.done():
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._migrate_legacy_json()
+        self._file_started_at = self._read_first_timestamp() or datetime.now()
+        self._writer_task = asyncio.create_task(self._writer_loop())
+
+    async def stop(self):
+        """تخلیه‌ی صف و بستن نویسنده"""
+        if not self._writer_task:
+            return
+        await self._queue.put(None)
+        await self._writer_task
+        self._writer_task = None
+
+    def append(self, level, message):
+        """افزودن یک رکورد به صف نوشتن - بدون انتظار برای دیسک"""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "level": level,
+            "message": message
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            print(f"⚠️ صف لاگ پر است، رکورد دور ریخته شد: {message[:50]}")
+
+    def _log_files(self):
+        """فایل‌های لاگ از قدیمی‌ترین نسخه‌ی چرخیده تا فایل جاری"""
+        files = [f"{self.path}.{i}" for i in range(self.backup_count, 0, -1)]
+        files.append(self.path)
+        return [path for path in files if os.path.exists(path)]
+
+    async def read(self, offset=0, limit=100):
+        """خواندن صفحه‌ای از لاگ‌ها (قدیمی‌ترین اول، شامل فایل‌های چرخیده) بدون بارگذاری کل فایل.
+
+        offset شماره‌ی خط در کل فایل‌هاست و خطوط خراب هم شمرده می‌شوند؛ خروجی: (لاگ‌ها، offset صفحه‌ی بعد یا None).
+        با حذف قدیمی‌ترین نسخه در چرخش، offsetهای قبلی به اندازه‌ی خطوط آن نسخه جابه‌جا می‌شوند.
+        """
+        logs = []
+        index = 0
+        for path in self._log_files():
+            async with aiofiles.open(path, 'r', encoding='utf-8') as f:
+                async for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    if index < offset:
+                        index += 1
+                        continue
+                    if len(logs) >= limit:
+                        return logs, index
+                    try:
+                        logs.append(json.loads(line))
+                    except ValueError:
+                        pass
+                    index += 1
+        return logs, None
+
+    async def _writer_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            entry = await self._queue.get()
+            if entry is None:
+                return
+            batch = [entry]
+            deadline = loop.time() + self.flush_interval
+            closing = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if entry is None:
+                    closing = True
+                    break
+                batch.append(entry)
+            await self._flush(batch)
+            if closing:
+                return
+
+    async def _flush(self, batch):
+        if not batch:
+            return
+        try:
+            self._rotate_if_needed()
+            data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in batch)
+            async with aiofiles.open(self.path, 'a', encoding='utf-8') as f:
+                await f.write(data)
+        except Exception as e:
+            print(f"❌ خطا در ذخیره لاگ: {e}")
+
+    def _rotate_if_needed(self):
+        if not os.path.exists(self.path):
+            self._file_started_at = datetime.now()
+            return
+
+        too_big = self.max_bytes and os.path.getsize(self.path) >= self.max_bytes
+        too_old = self.max_age and self._file_started_at and datetime.now() - self._file_started_at >= self.max_age
+        if not (too_big or too_old):
+            return
+
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file_started_at = datetime.now()
+
+    def _read_first_timestamp(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return datetime.fromisoformat(json.loads(f.readline())["timestamp"])
+        except Exception:
+            return None
+
+    def _migrate_legacy_json(self):
+        """تبدیل یک‌باره‌ی فایل قدیمی bot_logs.json (آرایه‌ی JSON) به JSONL"""
+        legacy = os.path.splitext(self.path)[0] + ".json"
+        if legacy == self.path or not os.path.exists(legacy) or os.path.exists(self.path):
+            return
+        try:
+            with open(legacy, 'r', encoding='utf-8') as f:
+                content = f.read()
+            logs = json.loads(content) if content else []
+            with open(self.path, 'w', encoding='utf-8') as f:
+                for entry in logs:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(legacy, legacy + ".migrated")
+        except Exception as e:
+            print(f"⚠️ خطا در انتقال لاگ‌های قدیمی: {e}")
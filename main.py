@@ -7,6 +7,7 @@ from datetime import datetime
 from contextlib import asynccontextmanager
 import threading
 from selenium_automation import EitaaAutomation
+from log_store import JsonlLogStore
 import subprocess
 import shutil
 
@@ -61,31 +62,12 @@ otp_needed = False
 
 # ================== توابع کمکی ==================
 def get_log_file_path():
-    return os.path.join(EXE_DIR, "bot_logs.json")
+    return os.path.join(EXE_DIR, "bot_logs.jsonl")
 
-async def save_log(level: str, message: str):
-    log_file = get_log_file_path()
-    log_entry = {
-        "timestamp": datetime.now().isoformat(),
-        "level": level,
-        "message": message
-    }
-
-    try:
-        logs = []
-        if os.path.exists(log_file):
-            async with aiofiles.open(log_file, 'r', encoding='utf-8') as f:
-                content = await f.read()
-                if content:
-                    logs = json.loads(content)
-
-        logs.append(log_entry)
+log_store = JsonlLogStore(get_log_file_path())
 
-        async with aiofiles.open(log_file, 'w', encoding='utf-8') as f:
-            await f.write(json.dumps(logs, ensure_ascii=False, indent=2))
-
-    except Exception as e:
-        print(f"❌ خطا در ذخیره لاگ: {e}")
+async def save_log(level: str, message: str):
+    log_store.append(level, message)
 
 # ================== تنظیمات FastAPI ==================
 app = FastAPI(title="فرستیار")
@@ -106,12 +88,14 @@ app.mount("/static", StaticFiles(directory=static_dir), name="static")
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("🚀 راه‌اندازی فرستیار...")
+    await log_store.start()
     await save_log("INFO", "برنامه راه‌اندازی شد")
     yield
     print("🛑 خاموش کردن...")
     await save_log("INFO", "برنامه خاموش می‌شود")
     if automation_instance:
         automation_instance.close()
+    await log_store.stop()
 
 app.router.lifespan_context = lifespan
 
@@ -177,14 +161,17 @@ async def post_send_message(data: MessageData):
     })
 
 @app.get("/logs")
-async def get_logs():
+async def get_logs(offset: int = 0, limit: int = 100):
     try:
-        log_file = get_log_file_path()
-        if os.path.exists(log_file):
-            async with aiofiles.open(log_file, 'r', encoding='utf-8') as f:
-                logs = json.loads(await f.read())
-                return JSONResponse({"logs": logs})
-        return JSONResponse({"logs": []})
+        offset = max(offset, 0)
+        limit = min(max(limit, 1), 1000)
+        logs, next_offset = await log_store.read(offset, limit)
+        return JSONResponse({
+            "logs": logs,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": next_offset
+        })
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
@@ -3,21 +3,37 @@
 """
 
 import asyncio
-import io
+import json
 import tempfile
 import os
+import re
 import uvicorn
-import pandas as pd
 from datetime import datetime
+from urllib.parse import quote
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, Form, BackgroundTasks, UploadFile, File
 from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 
-from .state_manager import state, add_log
-from .services import automation_worker, add_contacts_worker, process_contacts_excel
+from .state_manager import state, add_log, get_logs_since, state_notifier
+from .services import automation_worker, campaign_worker, add_contacts_worker, process_contacts_excel, parse_usernames_excel
+from .report_writer import report_writer
+from .sessions import sessions
+from .browser_pool import browser_pool
+from .rate_limiter import active_rate_limits
 from database import db
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    browser_pool.start()
+    yield
+    await browser_pool.stop()
+    await report_writer.stop()
+    db.close()
+
+app = FastAPI(lifespan=lifespan)
 templates = Jinja2Templates(directory="templates")
 
 # --- API Routes ---
@@ -30,15 +46,90 @@ async def home(request: Request):
 async def help_page(request: Request):
     return templates.TemplateResponse("help.html", {"request": request})
 
-@app.get("/get-status")
-async def get_status():
+def _status_payload(since=0):
+    logs, last_seq = get_logs_since(since)
+    otp_session = None if state.otp_required else sessions.awaiting_otp()
     return {
         "current_step": state.current_step,
-        "logs": state.logs,
-        "otp_required": state.otp_required,
-        "is_running": state.is_running
+        "logs": logs,
+        "last_seq": last_seq,
+        "otp_required": state.otp_required or otp_session is not None,
+        "otp_phone": otp_session.phone if otp_session else None,
+        "is_running": state.is_running,
+        "sessions": sessions.snapshot(),
+        "rate_limits": active_rate_limits()
+    }
+
+def _contacts_status_payload():
+    return {
+        "is_running": state.contacts_is_running,
+        "progress": state.contacts_progress,
+        "total": state.contacts_total,
+        "status": state.contacts_status,
+        "completed": state.contacts_completed,
+        "success_count": state.contacts_success_count,
+        "failed_count": state.contacts_failed_count,
+        "error": state.contacts_error,
+        "duplicate_count": state.duplicate_contacts_count,
+        "filtered_count": len(state.filtered_contacts_list)
     }
 
+@app.get("/get-status")
+async def get_status(since: int = 0):
+    return _status_payload(since)
+
+# فاصله‌ی ارسال heartbeat و پنجره‌ی تجمیع تغییرات پشت‌سرهم در جریان وضعیت (ثانیه)
+STATUS_STREAM_HEARTBEAT = 15
+STATUS_STREAM_COALESCE = 0.05
+
+@app.get("/status-stream")
+async def status_stream(request: Request, since: int = 0):
+    """جریان Server-Sent Events از تغییرات وضعیت، لاگ‌ها و پیشرفت مخاطبین"""
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    if since > state.log_seq:
+        # شناسه مربوط به اجرای قبلی سرور است
+        since = 0
+    
+    def sse(event, data, event_id=None):
+        message = f"event: {event}\n"
+        if event_id is not None:
+            message += f"id: {event_id}\n"
+        return message + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    async def event_stream():
+        last_seq = since
+        last_status = None
+        last_contacts = None
+        with state_notifier.subscribe() as subscription:
+            while not await request.is_disconnected():
+                status = _status_payload(last_seq)
+                snapshot = {k: v for k, v in status.items() if k not in ("logs", "last_seq")}
+                if status["logs"] or snapshot != last_status:
+                    last_seq = status["last_seq"]
+                    last_status = snapshot
+                    yield sse("status", status, last_seq)
+                
+                contacts = _contacts_status_payload()
+                if contacts != last_contacts:
+                    last_contacts = contacts
+                    yield sse("contacts", contacts)
+                
+                if not await subscription.wait(STATUS_STREAM_HEARTBEAT):
+                    yield ": heartbeat\n\n"
+                    continue
+                await asyncio.sleep(STATUS_STREAM_COALESCE)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# حداکثر تعداد تب‌های همزمان ارسال برای یک حساب
+MAX_SEND_TABS = 5
+
 @app.post("/start")
 async def start_process(
     background_tasks: BackgroundTasks,
@@ -49,36 +140,71 @@ async def start_process(
     msg: str = Form(None),
     min_d: str = Form(7),
     max_d: str = Form(16),
-    your_own_username: str = Form(None)
+    your_own_username: str = Form(None),
+    tabs: int = Form(1)
 ):
     if state.is_running:
         return {"status": "already_running"}
     
+    tabs = max(1, min(tabs, MAX_SEND_TABS))
     background_tasks.add_task(
         automation_worker, 
-        phone, mode, group_name, keyword, msg, min_d, max_d, your_own_username
+        phone, mode, group_name, keyword, msg, min_d, max_d, your_own_username, tabs
     )
     return {"status": "started"}
 
+@app.post("/start-campaign")
+async def start_campaign(
+    background_tasks: BackgroundTasks,
+    phones: str = Form(...),
+    msg: str = Form(...),
+    min_d: str = Form(7),
+    max_d: str = Form(16)
+):
+    """کمپین چندحسابی روی لیست اکسل بارگذاری شده"""
+    if state.is_running:
+        return {"status": "already_running"}
+    
+    phone_list = [p for p in re.split(r'[\s,،]+', phones) if p]
+    if not phone_list:
+        return {"status": "error", "message": "هیچ شماره‌ای وارد نشده است"}
+    if not state.target_list:
+        return {"status": "error", "message": "ابتدا فایل اکسل کاربران را بارگذاری کنید"}
+    
+    background_tasks.add_task(campaign_worker, phone_list, msg, min_d, max_d)
+    return {"status": "started", "accounts": len(phone_list)}
+
+@app.get("/campaigns")
+async def get_campaigns(limit: int = 20):
+    try:
+        return {"status": "success", "campaigns": db.get_recent_campaigns(max(1, min(limit, 100)))}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@app.get("/sessions")
+async def get_sessions():
+    return {"sessions": sessions.snapshot()}
+
 @app.post("/submit-otp")
-async def submit_otp(code: str = Form(...)):
-    state.otp_code = code
-    state.otp_event.set()
-    add_log("کد OTP دریافت شد.")
+async def submit_otp(code: str = Form(...), phone: str = Form(None)):
+    # کد به نشست حساب مشخص شده، یا در نبود آن به ورود اصلی/اولین نشست منتظر داده می‌شود
+    owner = sessions.get(phone) if phone else None
+    if owner is None and not state.otp_required:
+        owner = sessions.awaiting_otp()
+    owner = owner or state
+    owner.otp_code = code
+    owner.otp_event.set()
+    if owner is state:
+        add_log("کد OTP دریافت شد.")
+    else:
+        add_log(f"کد OTP برای {owner.phone} دریافت شد.")
     return {"status": "ok"}
 
 @app.post("/upload-excel")
 async def upload_excel(file: UploadFile = File(...)):
     try:
         contents = await file.read()
-        df = pd.read_excel(io.BytesIO(contents))
-        
-        usernames = []
-        for u in df.iloc[:, 0].dropna().astype(str):
-            username = u.strip()
-            if username and not username.startswith('@'):
-                username = '@' + username
-            usernames.append(username)
+        usernames = await run_in_threadpool(parse_usernames_excel, contents)
         
         state.target_list = usernames
         state.dispatch_report.clear()
@@ -92,6 +218,7 @@ async def upload_excel(file: UploadFile = File(...)):
 @app.post("/stop")
 async def stop_bot():
     state.stop_requested = True
+    sessions.stop_all()
     add_log("درخواست توقف دریافت شد.")
     return {"status": "stopping"}
 
@@ -118,10 +245,33 @@ async def edit_ready_message(index: int = Form(...), new_message: str = Form(...
         return {"status": "error", "message": str(e)}
 
 @app.get("/get-dispatch-report")
-async def get_dispatch_report():
-    db_reports = db.get_all_dispatch_reports()
+async def get_dispatch_report(
+    limit: int = 100,
+    cursor: str = None,
+    status: str = None,
+    operation_type: str = None,
+    phone_number: str = None,
+    date_from: str = None,
+    date_to: str = None
+):
+    filters = {
+        "status": status,
+        "operation_type": operation_type,
+        "phone_number": phone_number,
+        "date_from": date_from,
+        "date_to": date_to
+    }
+    limit = min(max(limit, 1), 500)
+    
+    try:
+        db_reports, next_cursor = db.get_dispatch_reports(limit=limit, cursor=cursor, **filters)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "message": str(e)})
+    
+    # شمارش‌ها فقط برای صفحه‌ی اول محاسبه می‌شوند؛ صفحات بعدی همان خلاصه را نگه می‌دارند
+    summary = db.get_dispatch_summary(**filters) if not cursor else None
     
-    if db_reports:
+    if db_reports or cursor or any(filters.values()):
         formatted_reports = []
         for report in db_reports:
             formatted_reports.append({
@@ -130,9 +280,9 @@ async def get_dispatch_report():
                 "error": report.get("error_message", ""),
                 "timestamp": report.get("timestamp", "")
             })
-        return {"report": formatted_reports, "source": "database"}
+        return {"report": formatted_reports, "source": "database", "next_cursor": next_cursor, "summary": summary}
     else:
-        return {"report": state.dispatch_report, "source": "memory"}
+        return {"report": state.dispatch_report, "source": "memory", "next_cursor": None, "summary": None}
 
 @app.post("/clear-report")
 async def clear_report():
@@ -140,84 +290,132 @@ async def clear_report():
     add_log("گزارش ارسال پاک شد.")
     return {"status": "cleared"}
 
+# --- خروجی‌های جریانی ---
+EXPORT_MEDIA_TYPES = {
+    "xlsx": 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    "csv": 'text/csv',
+    "jsonl": 'application/x-ndjson'
+}
+
+REPORT_EXPORT_HEADER = ["آی‌دی کاربر", "وضعیت", "توضیحات", "نوع عملیات", "زمان", "شماره تلفن"]
+REPORT_EXPORT_WIDTHS = {'A': 30, 'B': 15, 'C': 40, 'D': 15, 'E': 20, 'F': 20}
+STATUS_FA = {"success": "موفق", "failed": "ناموفق", "skipped": "رد شده"}
+
+def _report_export_rows(reports):
+    """تبدیل رکوردهای گزارش به ردیف‌های خروجی"""
+    for report in reports:
+        yield [
+            str(report["user_id"] or ""),
+            STATUS_FA.get(report["status"], "ناشناخته"),
+            str(report["error_message"] or ""),
+            str(report["operation_type"] or ""),
+            str(report["timestamp"] or ""),
+            str(report["phone_number"] or "")
+        ]
+
+def _memory_report_rows():
+    """ردیف‌های گزارش حافظه موقت وقتی دیتابیس خالی است"""
+    reports = [{
+        "user_id": report.get("id", ""),
+        "status": report.get("status", ""),
+        "error_message": report.get("error", ""),
+        "operation_type": "",
+        "timestamp": report.get("timestamp", ""),
+        "phone_number": ""
+    } for report in state.dispatch_report]
+    return _report_export_rows(reports)
+
+def _iter_csv(header, rows):
+    """تولید تکه‌به‌تکه‌ی CSV (با BOM برای نمایش درست فارسی در اکسل)"""
+    import csv
+    from io import StringIO
+    
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(header)
+    for i, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if i % 1000 == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def _iter_jsonl(header, rows):
+    """تولید تکه‌به‌تکه‌ی JSONL"""
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(dict(zip(header, row)), ensure_ascii=False))
+        if len(chunk) >= 1000:
+            yield ('\n'.join(chunk) + '\n').encode('utf-8')
+            chunk = []
+    if chunk:
+        yield ('\n'.join(chunk) + '\n').encode('utf-8')
+
+def _write_xlsx(file_path, sheet_title, header, rows, column_widths):
+    """نوشتن اکسل در حالت write-only تا مصرف حافظه ثابت بماند"""
+    import openpyxl
+    
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+    for col, width in column_widths.items():
+        ws.column_dimensions[col].width = width
+    ws.append(header)
+    for row in rows:
+        ws.append(row)
+    wb.save(file_path)
+
+async def _export_response(export_format, filename_prefix, sheet_title, header, rows, column_widths):
+    """ساخت پاسخ دانلود در قالب xlsx، csv یا jsonl"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{filename_prefix}_{timestamp}.{export_format}"
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    
+    if export_format == "csv":
+        return StreamingResponse(_iter_csv(header, rows), media_type=EXPORT_MEDIA_TYPES["csv"], headers=headers)
+    if export_format == "jsonl":
+        return StreamingResponse(_iter_jsonl(header, rows), media_type=EXPORT_MEDIA_TYPES["jsonl"], headers=headers)
+    
+    # فرمت xlsx باید کامل ساخته شود (zip)؛ در ترد جدا و روی فایل موقت نوشته می‌شود
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx")
+    file_path = temp_file.name
+    temp_file.close()
+    try:
+        await run_in_threadpool(_write_xlsx, file_path, sheet_title, header, rows, column_widths)
+    except Exception:
+        os.unlink(file_path)
+        raise
+    
+    return FileResponse(
+        path=file_path,
+        filename=filename,
+        media_type=EXPORT_MEDIA_TYPES["xlsx"],
+        headers=headers,
+        background=BackgroundTask(os.unlink, file_path)
+    )
+
 @app.get("/export-report-excel")
-async def export_report_excel():
+async def export_report_excel(format: str = "xlsx"):
+    if format not in EXPORT_MEDIA_TYPES:
+        return JSONResponse(status_code=400, content={"status": "error", "message": f"فرمت نامعتبر: {format}"})
+    
     try:
-        reports = db.get_all_dispatch_reports()
-        
-        if not reports and state.dispatch_report:
-            temp_reports = []
-            for report in state.dispatch_report:
-                temp_reports.append({
-                    "user_id": report.get("id", ""),
-                    "status": report.get("status", ""),
-                    "error_message": report.get("error", ""),
-                    "timestamp": report.get("timestamp", ""),
-                    "operation_type": "",
-                    "message_content": "",
-                    "phone_number": ""
-                })
-            reports = temp_reports
-        
-        df_data = []
-        for report in reports:
-            try:
-                status_text = report.get("status", "unknown")
-                
-                status_fa = ""
-                if status_text == "success":
-                    status_fa = "موفق"
-                elif status_text == "failed":
-                    status_fa = "ناموفق"
-                elif status_text == "skipped":
-                    status_fa = "رد شده"
-                else:
-                    status_fa = "ناشناخته"
-                
-                df_data.append({
-                    "آی‌دی کاربر": str(report.get("user_id", "")),
-                    "وضعیت": status_fa,
-                    "توضیحات": str(report.get("error_message", "")),
-                    "نوع عملیات": str(report.get("operation_type", "")),
-                    "زمان": str(report.get("timestamp", "")),
-                    "شماره تلفن": str(report.get("phone_number", ""))
-                })
-            except Exception as e:
-                add_log(f"⚠️ خطا در پردازش رکورد گزارش: {e}")
-                continue
-        
-        if not df_data:
-            df_data = [{
-                "آی‌دی کاربر": "بدون داده",
-                "وضعیت": "Info", 
-                "توضیحات": "هنوز گزارشی در دیتابیس ثبت نشده است",
-                "نوع عملیات": "",
-                "زمان": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "شماره تلفن": ""
-            }]
-        
-        df = pd.DataFrame(df_data)
-        
-        from io import BytesIO
-        output = BytesIO()
-        
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Report', index=False)
-            worksheet = writer.sheets['Report']
-            column_widths = {'A': 30, 'B': 15, 'C': 40, 'D': 15, 'E': 20, 'F': 20}
-            for col, width in column_widths.items():
-                worksheet.column_dimensions[col].width = width
+        if db.get_dispatch_summary()['total'] > 0:
+            rows = _report_export_rows(db.iter_dispatch_reports())
+        elif state.dispatch_report:
+            rows = _memory_report_rows()
+        else:
+            rows = iter([[
+                "بدون داده",
+                "Info",
+                "هنوز گزارشی در دیتابیس ثبت نشده است",
+                "",
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                ""
+            ]])
         
-        output.seek(0)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"eitaa_report_{timestamp}.xlsx"
-        
-        return StreamingResponse(
-            output,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
-        )
+        return await _export_response(format, "eitaa_report", 'Report', REPORT_EXPORT_HEADER, rows, REPORT_EXPORT_WIDTHS)
         
     except Exception as e:
         add_log(f"❌ خطا در ایجاد فایل اکسل: {str(e)}")
@@ -227,130 +425,51 @@ async def export_report_excel():
         )
 
 @app.get("/export-ids-excel")
-async def export_ids_excel():
+async def export_ids_excel(format: str = "xlsx"):
+    if format not in EXPORT_MEDIA_TYPES:
+        return JSONResponse(status_code=400, content={"status": "error", "message": f"فرمت نامعتبر: {format}"})
+    
     try:
-        reports = db.get_all_dispatch_reports()
-        
-        if not reports:
+        if db.get_dispatch_summary()['total'] == 0:
             return {"status": "error", "message": "گزارشی برای دانلود وجود ندارد"}
         
-        ids_set = set()
-        for report in reports:
-            user_id = report.get("user_id", "").strip()
-            if user_id:
-                ids_set.add(user_id)
-        
-        ids = list(ids_set)
-        
-        if not ids:
-            return {"status": "error", "message": "آی‌دی‌ای برای دانلود وجود ندارد"}
-        
-        df = pd.DataFrame({"آی‌دی کاربر": ids})
-        
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx")
-        file_path = temp_file.name
-        temp_file.close()
-        
-        try:
-            with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='لیست آی‌دی‌ها', index=False)
-                worksheet = writer.sheets['لیست آی‌دی‌ها']
-                worksheet.column_dimensions['A'].width = 30
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"eitaa_ids_{timestamp}.xlsx"
-            
-            return FileResponse(
-                path=file_path,
-                filename=filename,
-                media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                headers={
-                    'Content-Disposition': f'attachment; filename="{filename}"'
-                }
-            )
-            
-        except Exception as e:
-            add_log(f"❌ خطا در ذخیره فایل اکسل: {str(e)}")
-            csv_path = file_path.replace('.xlsx', '.csv')
-            df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"eitaa_ids_{timestamp}.csv"
-            return FileResponse(
-                path=csv_path,
-                filename=filename,
-                media_type='text/csv',
-                headers={
-                    'Content-Disposition': f'attachment; filename="{filename}"'
-                }
-            )
+        rows = ([user_id] for user_id in db.iter_dispatch_user_ids())
+        return await _export_response(format, "eitaa_ids", 'لیست آی‌دی‌ها', ["آی‌دی کاربر"], rows, {'A': 30})
         
     except Exception as e:
         add_log(f"❌ خطا در ایجاد فایل لیست آی‌دی‌ها: {str(e)}")
         return {"status": "error", "message": f"خطا در ایجاد فایل: {str(e)}"}
-    
-    finally:
-        try:
-            if 'file_path' in locals() and os.path.exists(file_path):
-                os.unlink(file_path)
-        except:
-            pass
             
 @app.get("/export-ids-simple")
 async def export_ids_simple():
     try:
-        reports = db.get_all_dispatch_reports()
-        
-        if not reports:
+        if db.get_dispatch_summary()['total'] == 0:
             return {"status": "error", "message": "گزارشی برای دانلود وجود ندارد"}
         
-        ids_set = set()
-        for report in reports:
-            user_id = report.get("user_id", "").strip()
-            if user_id:
-                ids_set.add(user_id)
-        
-        ids = list(ids_set)
-        
-        if not ids:
-            return {"status": "error", "message": "آی‌دی‌ای برای دانلود وجود ندارد"}
-        
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".txt", mode='w', encoding='utf-8')
-        file_path = temp_file.name
-        
-        for user_id in ids:
-            temp_file.write(user_id + '\n')
-        
-        temp_file.close()
+        def iter_lines():
+            for user_id in db.iter_dispatch_user_ids():
+                yield (user_id + '\n').encode('utf-8')
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"لیست_آی‌دی‌های_ایتا_{timestamp}.txt"
         
-        return FileResponse(
-            path=file_path,
-            filename=filename,
+        return StreamingResponse(
+            iter_lines(),
             media_type='text/plain',
             headers={
-                'Content-Disposition': f'attachment; filename="{filename}"'
+                'Content-Disposition': f"attachment; filename*=utf-8''{quote(filename)}"
             }
         )
         
     except Exception as e:
         add_log(f"❌ خطا در ایجاد فایل متنی: {str(e)}")
         return {"status": "error", "message": f"خطا در ایجاد فایل: {str(e)}"}
-    
-    finally:
-        try:
-            if 'file_path' in locals() and os.path.exists(file_path):
-                os.unlink(file_path)
-        except:
-            pass
 
 @app.post("/upload-contacts-excel")
 async def upload_contacts_excel(file: UploadFile = File(...)):
     try:
         contents = await file.read()
-        result = process_contacts_excel(contents)
+        result = await run_in_threadpool(process_contacts_excel, contents)
         return result
         
     except Exception as e:
@@ -373,17 +492,15 @@ async def start_add_contacts(
 
 @app.get("/get-contacts-status")
 async def get_contacts_status():
+    return _contacts_status_payload()
+
+@app.get("/get-upload-status")
+async def get_upload_status():
     return {
-        "is_running": state.contacts_is_running,
-        "progress": state.contacts_progress,
-        "total": state.contacts_total,
-        "status": state.contacts_status,
-        "completed": state.contacts_completed,
-        "success_count": state.contacts_success_count,
-        "failed_count": state.contacts_failed_count,
-        "error": state.contacts_error,
-        "duplicate_count": state.duplicate_contacts_count,
-        "filtered_count": len(state.filtered_contacts_list)
+        "is_running": state.upload_is_running,
+        "status": state.upload_status,
+        "processed": state.upload_processed,
+        "total": state.upload_total
     }
 
 @app.post("/clear-contacts-list")
@@ -402,7 +519,7 @@ async def clear_contacts_list():
 async def get_database_stats():
     try:
         contacts_stats = db.get_contacts_statistics()
-        reports, total_reports = db.get_dispatch_reports(limit=1)
+        total_reports = db.get_dispatch_summary()['total']
         
         return {
             "status": "success",
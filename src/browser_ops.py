@@ -3,22 +3,175 @@
 """
 
 import asyncio
+import os
 import unicodedata
 import re
 import random
 from playwright.async_api import async_playwright
 from .state_manager import state, add_log
+from .peer_cache import peer_cache
+from .failures import UserNotFoundError, classify_error, FAILURE_LABELS
 
-async def ensure_browser():
-    """اطمینان از وجود مرورگر"""
-    if not state.playwright_engine:
-        state.playwright_engine = await async_playwright().start()
-    if not state.browser:
-        add_log("در حال اجرای مرورگر...")
-        state.browser = await state.playwright_engine.chromium.launch(headless=False)
-        state.context = await state.browser.new_context()
-        state.page = await state.context.new_page()
-    return state.page
+EITAA_URL = "https://web.eitaa.com/"
+# پوشه‌ی ذخیره‌ی نشست ورود (storage_state) هر شماره
+SESSIONS_DIR = "browser_sessions"
+LOGGED_IN_SELECTOR = '#chatlist-container'
+LOGIN_FORM_SELECTOR = 'input[name="phone_number"], .input-field-phone .input-field-input'
+ADD_CONTACT_BUTTON_SELECTOR = 'button.btn-circle.btn-corner.tgico-add.rp'
+BACK_BUTTON_SELECTOR = 'button.btn-icon.tgico-left.sidebar-close-button'
+MENU_BUTTON_SELECTOR = 'div.btn-icon.btn-menu-toggle.rp.sidebar-tools-button.is-visible'
+CONTACTS_MENU_ITEM_SELECTOR = 'div.btn-menu-item.tgico-user.rp'
+MESSAGE_BUBBLE_SELECTOR = 'div.bubble'
+MESSAGE_TEXT_SELECTOR = 'div.message'
+# پیام «نتیجه‌ای یافت نشد» جستجوی سراسری؛ فقط دیدن آن (نه پایان مهلت) یعنی کاربر وجود ندارد
+NO_SEARCH_RESULTS_SELECTOR = '.search-super-no-result, .search-group-empty, .empty-placeholder'
+# نشانه‌ی ابتدای تاریخچه‌ی گفتگو (اولین پیام سرویس گروه)؛ بدون آن، توقف بارگذاری ممکن است فقط کندی شبکه باشد
+HISTORY_START_SELECTOR = '.bubble.service.is-first-message, .bubbles-inner.is-chat-start'
+CHAT_SCROLLABLE_SELECTOR = '//div[contains(@class, "bubbles")]/div[contains(@class, "scrollable-y")]'
+
+# مهلت پیش‌فرض انتظارهای شرطی (میلی‌ثانیه)
+WAIT_TIMEOUT = 5000
+# حداکثر تعداد دفعات بارگذاری پیام‌های قدیمی‌تر در جستجوی تاریخچه‌ی گروه
+HISTORY_MAX_PAGES = 50
+# فاصله‌ی بین کلیدها هنگام تایپ شماره (مکث عمدی شبیه انسان، میلی‌ثانیه)
+TYPING_DELAY = 100
+
+# حالت سبک: منابعی که برای تایپ و جستجو لازم نیستند بارگذاری نمی‌شوند و انیمیشن‌ها خاموش‌اند
+LEAN_MODE = True
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+HEADLESS = False
+NO_ANIMATIONS_SCRIPT = """
+document.addEventListener('DOMContentLoaded', () => {
+    const style = document.createElement('style');
+    style.textContent = '*, *::before, *::after { animation: none !important; transition: none !important; }';
+    document.head.appendChild(style);
+});
+"""
+
+# جلوگیری از اجرای همزمان دو مرورگر (گرم کردن استخر و اولین درخواست)
+_launch_lock = asyncio.Lock()
+
+async def launch_browser():
+    """اطمینان از اجرای موتور Playwright و مرورگر مشترک"""
+    async with _launch_lock:
+        if not state.playwright_engine:
+            state.playwright_engine = await async_playwright().start()
+        if not state.browser or not state.browser.is_connected():
+            add_log("در حال اجرای مرورگر...")
+            state.browser = await state.playwright_engine.chromium.launch(headless=HEADLESS)
+    return state.browser
+
+async def wait_for(page, selector, state='visible', timeout=None):
+    """انتظار شرطی برای وضعیت یک المان به جای خواب ثابت؛ در پایان مهلت False برمی‌گرداند"""
+    try:
+        await page.locator(selector).first.wait_for(state=state, timeout=timeout or WAIT_TIMEOUT)
+        return True
+    except Exception:
+        return False
+
+async def wait_for_older_message(page, oldest_mid, timeout=None):
+    """انتظار تا پیامی قدیمی‌تر از oldest_mid در گفتگو بارگذاری شود"""
+    try:
+        await page.wait_for_function(
+            "([selector, mid]) => { const b = document.querySelector(selector); return b && Number(b.dataset.mid) < mid; }",
+            arg=[f'{MESSAGE_BUBBLE_SELECTOR}[data-mid]', oldest_mid],
+            timeout=timeout or WAIT_TIMEOUT
+        )
+        return True
+    except Exception:
+        return False
+
+def storage_state_path(phone):
+    """مسیر فایل نشست ذخیره شده‌ی یک شماره"""
+    return os.path.join(SESSIONS_DIR, re.sub(r'\D', '', phone) + ".json")
+
+def saved_session_phones():
+    """شماره‌هایی که نشست ورودشان ذخیره شده است"""
+    try:
+        names = os.listdir(SESSIONS_DIR)
+    except OSError:
+        return []
+    return sorted(name[:-len(".json")] for name in names if name.endswith(".json"))
+
+async def _block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def _apply_lean_mode(context):
+    """مسدود کردن تصاویر، رسانه و فونت‌ها و خاموش کردن انیمیشن‌ها در context"""
+    await context.route("**/*", _block_heavy_resources)
+    await context.add_init_script(NO_ANIMATIONS_SCRIPT)
+
+async def new_account_context(browser, phone=None):
+    """ساخت context؛ در صورت وجود نشست ذخیره شده‌ی شماره، ورود قبلی بازیابی می‌شود"""
+    options = {"reduced_motion": "reduce"} if LEAN_MODE else {}
+    context = None
+    path = storage_state_path(phone) if phone else None
+    if path and os.path.exists(path):
+        try:
+            context = await browser.new_context(storage_state=path, **options)
+            add_log(f"نشست ذخیره شده‌ی {phone} بازیابی شد.")
+        except Exception as e:
+            add_log(f"⚠️ فایل نشست {phone} قابل استفاده نیست: {str(e)[:100]}")
+    if context is None:
+        context = await browser.new_context(**options)
+    if LEAN_MODE:
+        await _apply_lean_mode(context)
+    return context
+
+async def save_storage_state(context, phone):
+    """ذخیره‌ی نشست ورود برای اجراهای بعدی"""
+    try:
+        os.makedirs(SESSIONS_DIR, exist_ok=True)
+        await context.storage_state(path=storage_state_path(phone))
+        add_log(f"✓ نشست ورود {phone} ذخیره شد.")
+    except Exception as e:
+        add_log(f"⚠️ خطا در ذخیره‌ی نشست ورود: {str(e)[:100]}")
+
+async def open_eitaa(page):
+    """بارگذاری ایتا؛ صفحه‌ای که از قبل ایتا (لیست چت یا فرم ورود) در آن بارگذاری شده دوباره بارگذاری نمی‌شود"""
+    if page.url.startswith(EITAA_URL) and await page.locator(f'{LOGGED_IN_SELECTOR}, {LOGIN_FORM_SELECTOR}').count() > 0:
+        return
+    await page.goto(EITAA_URL, timeout=30000)
+
+async def probe_login(page, timeout=15000):
+    """تشخیص سریع وضعیت ورود: هر کدام از لیست چت یا فرم ورود که زودتر ظاهر شود"""
+    try:
+        await page.wait_for_selector(f'{LOGGED_IN_SELECTOR}, {LOGIN_FORM_SELECTOR}', timeout=timeout)
+    except:
+        return False
+    return await page.locator(LOGGED_IN_SELECTOR).count() > 0
+
+async def open_extra_pages(count, context=None):
+    """باز کردن تب‌های اضافه در همان context برای ارسال همزمان"""
+    context = context or state.context
+    
+    async def open_page():
+        new_page = await context.new_page()
+        try:
+            await new_page.goto(EITAA_URL, timeout=30000)
+            await new_page.wait_for_selector(LOGGED_IN_SELECTOR, timeout=30000)
+            return new_page
+        except Exception as e:
+            add_log(f"⚠️ باز کردن تب اضافه ناموفق بود: {str(e)[:100]}")
+            await new_page.close()
+            return None
+    
+    pages = await asyncio.gather(*(open_page() for _ in range(count)))
+    pages = [p for p in pages if p]
+    if pages:
+        add_log(f"✓ {len(pages)} تب اضافه برای ارسال همزمان آماده شد")
+    return pages
+
+async def close_pages(pages):
+    """بستن تب‌های اضافه"""
+    for p in pages:
+        try:
+            await p.close()
+        except:
+            pass
 
 async def go_to_contacts_page(page):
     """هدایت به صفحه مخاطبین"""
@@ -27,12 +180,11 @@ async def go_to_contacts_page(page):
         
         for _ in range(2):
             await page.keyboard.press('Escape')
-            await asyncio.sleep(1)
         
-        await asyncio.sleep(2)
+        await wait_for(page, f'{ADD_CONTACT_BUTTON_SELECTOR}, {BACK_BUTTON_SELECTOR}, {MENU_BUTTON_SELECTOR}')
         
         try:
-            add_button = page.locator('button.btn-circle.btn-corner.tgico-add.rp').first
+            add_button = page.locator(ADD_CONTACT_BUTTON_SELECTOR).first
             if await add_button.count() > 0:
                 add_log("✓ قبلاً در صفحه مخاطبین هستیم")
                 return True
@@ -40,14 +192,12 @@ async def go_to_contacts_page(page):
             pass
         
         try:
-            back_button = page.locator('button.btn-icon.tgico-left.sidebar-close-button').first
+            back_button = page.locator(BACK_BUTTON_SELECTOR).first
             if await back_button.count() > 0:
                 await back_button.click(timeout=3000)
-                await asyncio.sleep(2)
                 add_log("✓ دکمه بازگشت کلیک شد")
                 
-                add_button = page.locator('button.btn-circle.btn-corner.tgico-add.rp').first
-                if await add_button.count() > 0:
+                if await wait_for(page, ADD_CONTACT_BUTTON_SELECTOR, state='attached', timeout=2000):
                     add_log("✓ بعد از بازگشت در صفحه مخاطبین هستیم")
                     return True
         except:
@@ -56,37 +206,26 @@ async def go_to_contacts_page(page):
         add_log("از طریق منو به مخاطبین می‌رویم...")
         
         try:
-            menu_button = page.locator('div.btn-icon.btn-menu-toggle.rp.sidebar-tools-button.is-visible').first
+            menu_button = page.locator(MENU_BUTTON_SELECTOR).first
             if await menu_button.count() > 0:
                 await menu_button.click(timeout=5000)
-                await asyncio.sleep(2)
         except:
             try:
                 await page.click('div.animated-menu-icon')
-                await asyncio.sleep(2)
             except:
                 add_log("⚠️ نتوانست منو را باز کند")
                 return False
         
         try:
-            contacts_option = page.locator('div.btn-menu-item.tgico-user.rp').first
-            if await contacts_option.count() > 0:
-                await contacts_option.click(timeout=5000)
-                await asyncio.sleep(3)
+            if await wait_for(page, CONTACTS_MENU_ITEM_SELECTOR):
+                await page.locator(CONTACTS_MENU_ITEM_SELECTOR).first.click(timeout=5000)
                 
-                try:
-                    await page.wait_for_selector('button.btn-circle.btn-corner.tgico-add.rp', timeout=5000)
+                if await wait_for(page, ADD_CONTACT_BUTTON_SELECTOR, timeout=7000):
                     add_log("✓ به صفحه مخاطبین بازگشتیم")
                     return True
-                except:
-                    await asyncio.sleep(2)
-                    add_button = page.locator('button.btn-circle.btn-corner.tgico-add.rp').first
-                    if await add_button.count() > 0:
-                        add_log("✓ صفحه مخاطبین بارگذاری شد")
-                        return True
-                    else:
-                        add_log("⚠️ صفحه بارگذاری شد اما دکمه افزودن پیدا نشد")
-                        return False
+                else:
+                    add_log("⚠️ صفحه بارگذاری شد اما دکمه افزودن پیدا نشد")
+                    return False
         except:
             add_log("⚠️ نتوانست گزینه مخاطبین را پیدا کند")
             return False
@@ -95,94 +234,190 @@ async def go_to_contacts_page(page):
         add_log(f"⚠️ خطا در بازگشت به صفحه مخاطبین: {e}")
         return False
 
-async def send_direct_message(page, username_with_at, message_to_send, min_d, max_d, operation_type="unknown", phone_number=None):
-    """ارسال پیام مستقیم به کاربر"""
+async def open_chat_by_peer(page, peer_id):
+    """باز کردن مستقیم گفتگو با تغییر hash آدرس؛ در صورت باز نشدن گفتگوی همان peer مقدار False"""
+    await page.evaluate("peerId => { location.hash = '#' + peerId; }", peer_id)
+    return await wait_for(page, f'.chat-info .peer-title[data-peer-id="{peer_id}"]', timeout=3000)
+
+async def open_chat_by_search(page, search_input_locator, username_with_at):
+    """یافتن گفتگو از طریق جستجوی سراسری و ذخیره‌ی شناسه‌ی آن در کش"""
+    await search_input_locator.click(timeout=5000)
+    await search_input_locator.fill(username_with_at, timeout=5000)
+
+    user_item_selector_dm = f'li.rp.chatlist-chat:has(p.dialog-subtitle > span.user-last-message > i:has-text("{username_with_at}"))'
+    user_chat_element_locator_dm = page.locator(user_item_selector_dm).first
+    no_results_locator = page.locator(NO_SEARCH_RESULTS_SELECTOR)
+    
+    # پایان مهلت (جستجوی کند یا تب قفل شده) خطای گذراست و به عنوان کاربر ناموجود ثبت نمی‌شود
+    await user_chat_element_locator_dm.or_(no_results_locator).first.wait_for(state='attached', timeout=10000)
+    if await user_chat_element_locator_dm.count() == 0:
+        raise UserNotFoundError(f"کاربر {username_with_at} در نتایج جستجو نبود")
+    await user_chat_element_locator_dm.wait_for(state='visible', timeout=10000)
+    peer_id = await user_chat_element_locator_dm.get_attribute('data-peer-id')
+    await user_chat_element_locator_dm.click(timeout=5000)
+    
+    if peer_id:
+        await peer_cache.put(username_with_at, peer_id)
+
+async def send_direct_message(page, username_with_at, message_to_send, operation_type="unknown", phone_number=None):
+    """ارسال پیام مستقیم به کاربر؛ خروجی: (موفقیت، پیام، دسته‌ی خطا یا None)"""
     search_input_locator = page.locator('input.input-search-input[placeholder="جستجو"]').first
+    searched = False
+    stage = "open"
     
     try:
-        clean_user = username_with_at.lstrip('@')
         add_log(f"🗣️ در حال تلاش برای ارسال پیام به {username_with_at}...")
 
-        await search_input_locator.click(timeout=5000)
-        await search_input_locator.fill("", timeout=3000)
-        await page.wait_for_timeout(500)
-        await search_input_locator.fill(username_with_at, timeout=5000)
-        await asyncio.sleep(1)
-
-        user_item_selector_dm = f'li.rp.chatlist-chat:has(p.dialog-subtitle > span.user-last-message > i:has-text("{username_with_at}"))'
-        user_chat_element_locator_dm = page.locator(user_item_selector_dm).first
-        
-        await user_chat_element_locator_dm.wait_for(state='attached', timeout=10000)
-        await user_chat_element_locator_dm.wait_for(state='visible', timeout=10000)
-        await user_chat_element_locator_dm.click(timeout=5000)
+        peer_id = peer_cache.get(username_with_at)
+        if not (peer_id and await open_chat_by_peer(page, peer_id)):
+            if peer_id:
+                await peer_cache.invalidate(username_with_at)
+            searched = True
+            await open_chat_by_search(page, search_input_locator, username_with_at)
 
         dm_message_input_selector = 'div.input-message-input[contenteditable="true"]:not(.input-field-input-fake)'
         dm_input_area_locator = page.locator(dm_message_input_selector)
         
+        stage = "input"
         await dm_input_area_locator.wait_for(state='visible', timeout=10000)
         await dm_input_area_locator.fill(message_to_send)
         await dm_input_area_locator.press('Enter')
         add_log(f"📨 پیام به {username_with_at} ارسال شد.")
         
-        return True, "ارسال با موفقیت انجام شد."
+        return True, "ارسال با موفقیت انجام شد.", None
         
     except Exception as e:
         error_msg = str(e)[:100]
-        add_log(f"❌ خطا در ارسال به {username_with_at}: {error_msg}")
-        return False, f"خطا: {error_msg}"
+        kind = classify_error(e, stage)
+        add_log(f"❌ خطا در ارسال به {username_with_at} ({FAILURE_LABELS[kind]}): {error_msg}")
+        return False, f"خطا: {error_msg}", kind
         
     finally:
         try:
-            if await search_input_locator.is_visible(timeout=1000):
+            if searched and await search_input_locator.is_visible(timeout=1000):
                 await search_input_locator.click(timeout=3000)
                 await search_input_locator.fill("")
-                await page.wait_for_timeout(200)
         except:
             pass
 
 async def add_single_contact(page, contact, i, total, phone_number):
-    """افزودن یک مخاطب"""
+    """افزودن یک مخاطب؛ خروجی: (موفقیت، دسته‌ی خطا یا None)"""
+    stage = "open"
     try:
         name = contact['name']
         phone = contact['phone']
         
         add_log(f"📝 افزودن مخاطب {i+1}/{total}: {name} ({phone})")
         
-        add_button = page.locator('button.btn-circle.btn-corner.tgico-add.rp').first
+        add_button = page.locator(ADD_CONTACT_BUTTON_SELECTOR).first
         await add_button.wait_for(state='visible', timeout=3000)
         await add_button.click(timeout=2000)
         add_log("  ✓ دکمه افزودن مخاطب کلیک شد")
         
+        stage = "input"
         name_input = page.locator('div.input-field:has(label:has-text("نام")) div.input-field-input').first
         await name_input.fill(name)
-        await asyncio.sleep(0.5)
         
         phone_input = page.locator('div.input-field.input-field-phone div.input-field-input').first
         await phone_input.fill('')
-        await phone_input.type(f"+98 {phone[:3]} {phone[3:6]} {phone[6:]}", delay=100)
-        await asyncio.sleep(0.5)
+        await phone_input.type(f"+98 {phone[:3]} {phone[3:6]} {phone[6:]}", delay=TYPING_DELAY)
         
-        submit_button = page.locator('button.btn-primary.btn-color-primary.rp:has-text("افزودن")').first
-        await submit_button.click(timeout=2000)
+        stage = "submit"
+        submit_selector = 'button.btn-primary.btn-color-primary.rp:has-text("افزودن")'
+        await page.locator(submit_selector).first.click(timeout=2000)
         add_log("  ✓ دکمه افزودن کلیک شد")
         
-        await asyncio.sleep(2)
+        # بسته شدن فرم یعنی درخواست افزودن پاسخ گرفته است
+        await wait_for(page, submit_selector, state='hidden')
         
         await page.keyboard.press('Escape')
-        await asyncio.sleep(1)
+        await wait_for(page, ADD_CONTACT_BUTTON_SELECTOR)
         add_log("  ✓ Esc زده شد (فرم بسته شد)")
         
-        return True
+        return True, None
         
     except Exception as e:
         error_msg = str(e)[:100]
-        add_log(f"❌ خطا در افزودن مخاطب {i+1}: {error_msg}")
+        kind = classify_error(e, stage)
+        add_log(f"❌ خطا در افزودن مخاطب {i+1} ({FAILURE_LABELS[kind]}): {error_msg}")
         
-        for _ in range(3):
-            await page.keyboard.press('Escape')
-            await asyncio.sleep(0.5)
+        try:
+            for _ in range(3):
+                await page.keyboard.press('Escape')
+            await wait_for(page, ADD_CONTACT_BUTTON_SELECTOR)
+        except Exception:
+            pass
         
-        return False
+        return False, kind
+
+MESSAGE_BATCH_SCRIPT = """
+([bubbleSelector, textSelector, afterMid, beforeMid]) => {
+    const messages = [];
+    let oldest = null, newest = null;
+    for (const bubble of document.querySelectorAll(bubbleSelector)) {
+        const mid = Number(bubble.dataset.mid);
+        if (!mid) continue;
+        oldest = oldest === null ? mid : Math.min(oldest, mid);
+        newest = newest === null ? mid : Math.max(newest, mid);
+        if (mid <= afterMid || (beforeMid !== null && mid >= beforeMid)) continue;
+        const message = bubble.querySelector(textSelector);
+        if (message) messages.push([mid, message.innerText]);
+    }
+    messages.sort((a, b) => a[0] - b[0]);
+    return {messages, oldest, newest};
+}
+"""
+
+async def extract_message_batch(page, after_mid=0, before_mid=None):
+    """متن پیام‌های بارگذاری شده با شناسه‌ی بین after_mid و before_mid در یک فراخوانی page.evaluate"""
+    return await page.evaluate(MESSAGE_BATCH_SCRIPT, [MESSAGE_BUBBLE_SELECTOR, MESSAGE_TEXT_SELECTOR, after_mid, before_mid])
+
+async def scan_history_for_prefix(page, keyword, after_mid=0, max_pages=HISTORY_MAX_PAGES):
+    """خواندن تاریخچه‌ی گفتگو از جدید به قدیم، دسته به دسته؛ با پیدا شدن پیام یا رسیدن به after_mid متوقف می‌شود.
+    خروجی: (متن پیام یا None، شناسه‌ی جدیدترین پیام دیده شده، تعداد پیام‌های بررسی شده، کامل؟)
+    «کامل» یعنی همه‌ی پیام‌های جدیدتر از after_mid بررسی شده‌اند (رسیدن به after_mid یا ابتدای واقعی تاریخچه)؛
+    توقف به خاطر max_pages یا بارگذاری کند کامل نیست"""
+    scrollable = page.locator(CHAT_SCROLLABLE_SELECTOR).first
+    newest_mid = after_mid
+    before_mid = None
+    scanned = 0
+    
+    for page_no in range(max_pages + 1):
+        batch = await extract_message_batch(page, after_mid, before_mid)
+        if batch["newest"] is not None:
+            newest_mid = max(newest_mid, batch["newest"])
+        
+        messages = batch["messages"]
+        scanned += len(messages)
+        match = find_last_prefixed_message([text for _, text in messages], keyword)
+        if match:
+            return match, newest_mid, scanned, True
+        
+        oldest = batch["oldest"]
+        if oldest is None or oldest <= after_mid:
+            return None, newest_mid, scanned, True
+        if page_no == max_pages:
+            break
+        before_mid = oldest
+        
+        if await scrollable.count() == 0:
+            break
+        await scrollable.evaluate("el => el.scrollTop = 0")
+        if not await wait_for_older_message(page, oldest):
+            # پیام قدیمی‌تری نیامد: یا ابتدای تاریخچه است یا بارگذاری کند بوده
+            return None, newest_mid, scanned, await page.locator(HISTORY_START_SELECTOR).count() > 0
+    
+    return None, newest_mid, scanned, False
+
+def find_last_prefixed_message(texts, keyword):
+    """آخرین پیامی که پس از نرمال‌سازی با پیشوند داده شده شروع می‌شود"""
+    if not keyword:
+        return None
+    for text in reversed(texts):
+        text = text.strip() if text else ""
+        if text and normalize_persian_text(text).startswith(keyword):
+            return text
+    return None
 
 def normalize_persian_text(text):
     """نرمال‌سازی متن فارسی"""
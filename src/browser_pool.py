@@ -0,0 +1,245 @@
+"""
+استخر مرورگر - مرورگر و صفحه‌های آماده از زمان راه‌اندازی برنامه گرم نگه داشته می‌شوند
+"""
+
+import asyncio
+import os
+import re
+from collections import deque
+
+from .state_manager import state, add_log
+from .browser_ops import launch_browser, new_account_context, storage_state_path, saved_session_phones, EITAA_URL
+from .sessions import sessions
+
+# تعداد صفحه‌های آماده و فاصله‌ی بررسی سلامت آن‌ها (ثانیه)
+BROWSER_POOL_SIZE = 1
+BROWSER_POOL_HEALTH_INTERVAL = 30
+# مهلت پاسخ صفحه به بررسی زنده بودن و مهلت بستن context صفحه‌ی قفل شده (ثانیه)
+LIVENESS_TIMEOUT = 3
+CLOSE_TIMEOUT = 5
+
+
+class BrowserPool:
+    def __init__(self, size=BROWSER_POOL_SIZE, health_interval=BROWSER_POOL_HEALTH_INTERVAL):
+        self.size = size
+        self.health_interval = health_interval
+        self._ready = {}         # صفحه‌های آماده‌ی تحویل به ازای نشست (شماره‌ی دارای نشست ذخیره شده یا None)
+        self._leased = set()     # صفحه‌های تحویل داده شده
+        self._crashed = set()
+        self._checkouts = 0      # تحویل‌های در حال انجام (context ساخته شده ولی هنوز ثبت نشده)
+        self._fill_lock = asyncio.Lock()
+        self._task = None
+        self._fill_task = None
+
+    def start(self):
+        """گرم کردن مرورگر در پس‌زمینه و شروع بررسی سلامت (در lifespan برنامه)"""
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        try:
+            await launch_browser()
+            await self.fill()
+        except Exception as e:
+            add_log(f"⚠️ گرم کردن مرورگر ناموفق بود: {str(e)[:100]}")
+            return
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                add_log(f"⚠️ خطا در بررسی سلامت مرورگر: {str(e)[:100]}")
+
+    async def _open_page(self, context):
+        page = await context.new_page()
+        page.on("crash", self._crashed.add)
+        return page
+
+    async def _warm_page(self, phone=None):
+        context = await new_account_context(state.browser, phone)
+        try:
+            page = await self._open_page(context)
+            await page.goto(EITAA_URL, timeout=30000)
+            return page
+        except:
+            await context.close()
+            raise
+
+    def _session_key(self, phone):
+        """کلید صفحه‌های آماده: شماره‌ی دارای نشست ذخیره شده، وگرنه None (context بدون ورود)"""
+        if phone and os.path.exists(storage_state_path(phone)):
+            return re.sub(r'\D', '', phone)
+        return None
+
+    def _ready_pages(self):
+        return [page for pages in self._ready.values() for page in pages]
+
+    async def fill(self):
+        """تکمیل صفحه‌های آماده تا اندازه‌ی استخر، برای context بدون ورود و هر نشست ذخیره شده"""
+        async with self._fill_lock:
+            keys = [None] + saved_session_phones()
+            for key in [k for k in self._ready if k not in keys]:
+                # فایل نشست حذف شده است
+                for page in self._ready.pop(key):
+                    await self._discard(page)
+            for key in keys:
+                pages = self._ready.setdefault(key, deque())
+                while len(pages) < self.size:
+                    try:
+                        pages.append(await self._warm_page(key))
+                    except Exception as e:
+                        add_log(f"⚠️ آماده‌سازی صفحه‌ی مرورگر ناموفق بود: {str(e)[:100]}")
+                        return
+
+    def is_healthy(self, page):
+        """بررسی بدون رفت و برگشت: صفحه بسته یا کرش نکرده و مرورگرش متصل است"""
+        if page is None or page.is_closed() or page in self._crashed:
+            return False
+        browser = page.context.browser
+        return browser is None or browser.is_connected()
+
+    async def probe(self, page):
+        """بررسی زنده بودن صفحه: رویدادهای کرش/بسته شدن و پاسخ به یک evaluate کوتاه"""
+        return self.is_healthy(page) and await self._responsive(page)
+
+    async def checkout(self, phone=None):
+        """تحویل یک صفحه؛ برای شماره‌ای با نشست ذخیره شده صفحه‌ی آماده‌ی همان نشست تحویل داده می‌شود"""
+        self._checkouts += 1
+        try:
+            browser = await launch_browser()
+            pages = self._ready.get(self._session_key(phone))
+            while pages:
+                page = pages.popleft()
+                if self.is_healthy(page):
+                    self._leased.add(page)
+                    if not self._fill_task or self._fill_task.done():
+                        self._fill_task = asyncio.create_task(self.fill())
+                    return page
+                await self._discard(page)
+            
+            context = await new_account_context(browser, phone)
+            page = await self._open_page(context)
+            self._leased.add(page)
+            return page
+        finally:
+            self._checkouts -= 1
+
+    async def release(self, page):
+        """بستن context صفحه‌ای که دیگر استفاده نمی‌شود"""
+        self._leased.discard(page)
+        await self._discard(page)
+
+    async def _discard(self, page):
+        self._crashed.discard(page)
+        try:
+            # بستن context تب قفل شده هم ممکن است پاسخ ندهد
+            await asyncio.wait_for(page.context.close(), CLOSE_TIMEOUT)
+        except:
+            pass
+
+    async def _responsive(self, page):
+        try:
+            await asyncio.wait_for(page.evaluate("1"), LIVENESS_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def restart_browser(self):
+        """بستن کامل مرورگر (حتی اگر قفل شده باشد) و اجرای دوباره؛ صفحه‌های قبلی همگی نامعتبر می‌شوند"""
+        add_log("♻️ راه‌اندازی دوباره‌ی مرورگر...")
+        self._ready.clear()
+        self._leased.clear()
+        self._crashed.clear()
+        try:
+            if state.browser:
+                await asyncio.wait_for(state.browser.close(), CLOSE_TIMEOUT)
+        except:
+            pass
+        state.browser = None
+        state.context = None
+        state.page = None
+        for session in sessions.all():
+            session.context = None
+            session.page = None
+        return await launch_browser()
+
+    async def check_health(self):
+        """جایگزینی صفحه‌های آماده‌ی خراب، رها کردن صفحه‌های تحویلی کرش کرده و بستن contextهای بی‌صاحب"""
+        for pages in list(self._ready.values()):
+            for page in list(pages):
+                if not self.is_healthy(page) or not await self._responsive(page):
+                    if page in pages:
+                        pages.remove(page)
+                    await self._discard(page)
+        
+        for page in list(self._leased):
+            if not self.is_healthy(page):
+                await self.release(page)
+        
+        # زیر قفل fill تا context صفحه‌ای که در پس‌زمینه هنوز بارگذاری می‌شود رها شده حساب نشود
+        async with self._fill_lock:
+            if state.browser and self._checkouts == 0:
+                owned = {p.context for p in self._ready_pages()} | {p.context for p in self._leased}
+                owned.add(state.context)
+                owned.update(s.context for s in sessions.all())
+                leaked = [c for c in state.browser.contexts if c not in owned]
+                for context in leaked:
+                    try:
+                        await context.close()
+                    except:
+                        pass
+                if leaked:
+                    add_log(f"🧹 {len(leaked)} context رها شده‌ی مرورگر بسته شد")
+        
+        await self.fill()
+
+    async def stop(self):
+        """توقف بررسی سلامت و بستن مرورگر"""
+        for task in (self._task, self._fill_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._fill_task = None
+        self._ready.clear()
+        self._leased.clear()
+        try:
+            if state.browser:
+                await state.browser.close()
+            if state.playwright_engine:
+                await state.playwright_engine.stop()
+        except:
+            pass
+        state.browser = None
+        state.playwright_engine = None
+        state.context = None
+        state.page = None
+
+
+browser_pool = BrowserPool()
+
+
+async def ensure_browser(phone=None):
+    """اطمینان از وجود مرورگر"""
+    if state.page and (not browser_pool.is_healthy(state.page) or (phone and state.context_phone != phone)):
+        # صفحه‌ی فعلی خراب شده یا متعلق به حساب دیگری است
+        await browser_pool.release(state.page)
+        state.page = None
+    if not state.page:
+        state.page = await browser_pool.checkout(phone)
+        state.context = state.page.context
+        state.context_phone = phone
+    return state.page
+
+async def ensure_session_page(session):
+    """context جداگانه (کوکی و storage مستقل) برای نشست یک حساب"""
+    if session.page and not browser_pool.is_healthy(session.page):
+        await browser_pool.release(session.page)
+        session.page = None
+    if not session.page:
+        session.page = await browser_pool.checkout(session.phone)
+        session.context = session.page.context
+    return session.page
@@ -0,0 +1,62 @@
+"""
+دسته‌بندی خطاهای ارسال و افزودن مخاطب برای تصمیم‌گیری درباره‌ی تلاش مجدد
+"""
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+USER_NOT_FOUND = "user_not_found"
+SELECTOR_TIMEOUT = "selector_timeout"
+PAGE_CRASHED = "page_crashed"
+INPUT_NOT_READY = "input_not_ready"
+UNKNOWN = "unknown"
+
+# خطاهایی که تلاش دوباره فایده‌ای ندارد و در کمپین‌های بعدی هم از گیرنده صرف نظر می‌شود
+PERMANENT_FAILURES = {USER_NOT_FOUND}
+
+# فاصله‌ی پایه‌ی تلاش مجدد هر دسته (ثانیه)؛ در هر تلاش بعدی دو برابر می‌شود
+RETRY_BACKOFF = {
+    SELECTOR_TIMEOUT: 5,
+    INPUT_NOT_READY: 3,
+    PAGE_CRASHED: 15,
+    UNKNOWN: 10,
+}
+MAX_RETRIES = 2
+
+FAILURE_LABELS = {
+    USER_NOT_FOUND: "کاربر پیدا نشد",
+    SELECTOR_TIMEOUT: "پایان مهلت انتظار",
+    PAGE_CRASHED: "صفحه از کار افتاد",
+    INPUT_NOT_READY: "کادر ورودی آماده نبود",
+    UNKNOWN: "خطای ناشناخته",
+}
+
+
+
+class UserNotFoundError(Exception):
+    """نتیجه‌ای برای نام کاربری جستجو شده پیدا نشد"""
+
+
+_CRASH_MARKERS = ("target crashed", "page crashed", "target closed", "has been closed", "browser has been closed")
+
+
+def classify_error(error, stage=None):
+    """تعیین دسته‌ی خطا از روی نوع استثنا و مرحله‌ای که در آن رخ داده است"""
+    if isinstance(error, UserNotFoundError):
+        return USER_NOT_FOUND
+    text = str(error).lower()
+    if any(marker in text for marker in _CRASH_MARKERS):
+        return PAGE_CRASHED
+    if isinstance(error, PlaywrightTimeoutError) or "timeout" in text:
+        if stage == "input":
+            return INPUT_NOT_READY
+        return SELECTOR_TIMEOUT
+    return UNKNOWN
+
+
+def is_permanent(kind):
+    return kind in PERMANENT_FAILURES
+
+
+def retry_delay(kind, attempts):
+    """فاصله‌ی لازم پیش از تلاش شماره‌ی attempts+1 برای این دسته"""
+    return RETRY_BACKOFF.get(kind, RETRY_BACKOFF[UNKNOWN]) * (2 ** max(attempts - 1, 0))
@@ -0,0 +1,45 @@
+"""
+کش نام کاربری -> شناسه‌ی گفتگو (peer id) برای باز کردن مستقیم گفتگو بدون جستجو
+"""
+
+import asyncio
+
+from database import db
+
+
+class PeerCache:
+    def __init__(self, database):
+        self.database = database
+        self._peers = {}
+
+    @staticmethod
+    def _key(username):
+        return username.lstrip('@').lower()
+
+    def preload(self, usernames):
+        """بارگذاری دسته‌ای شناسه‌های ذخیره شده پیش از شروع ارسال"""
+        keys = {self._key(u) for u in usernames} - self._peers.keys()
+        found = self.database.get_peer_ids(keys)
+        for key in keys:
+            self._peers[key] = found.get(key)
+
+    def get(self, username):
+        key = self._key(username)
+        if key not in self._peers:
+            self._peers[key] = self.database.get_peer_ids([key]).get(key)
+        return self._peers[key]
+
+    async def put(self, username, peer_id):
+        key = self._key(username)
+        if self._peers.get(key) == peer_id:
+            return
+        self._peers[key] = peer_id
+        await asyncio.to_thread(self.database.save_peer_id, key, peer_id)
+
+    async def invalidate(self, username):
+        key = self._key(username)
+        self._peers[key] = None
+        await asyncio.to_thread(self.database.delete_peer_id, key)
+
+
+peer_cache = PeerCache(db)
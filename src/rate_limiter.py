@@ -0,0 +1,94 @@
+"""
+محدودکننده‌ی نرخ ارسال (سطل توکن تطبیقی) مشترک بین همه‌ی تب‌های یک حساب
+"""
+
+import asyncio
+import weakref
+from collections import deque
+from random import uniform
+
+from .state_manager import add_log, state_notifier
+
+# کمترین فاصله‌ی ممکن (جلوگیری از تقسیم بر صفر) و بیشترین فاصله‌ی مجاز بین دو ارسال در حالت تطبیقی (ثانیه)
+MIN_INTERVAL_FLOOR = 0.1
+MAX_INTERVAL_CEILING = 120.0
+# ارسال کندتر از این مقدار (ثانیه) مانند خطا نشانه‌ی فشار تلقی می‌شود
+SLOW_LATENCY = 8.0
+# ضریب کاهش فاصله پس از هر ارسال سریع و موفق، و ضریب افزایش پس از خطا
+SPEEDUP_FACTOR = 0.95
+BACKOFF_FACTOR = 2.0
+MILD_BACKOFF_FACTOR = 1.25
+# تعداد نتایج اخیر برای تشخیص خطاهای پشت‌سرهم
+RECENT_WINDOW = 10
+# نوسان تصادفی فاصله‌ها برای الگوی شبیه انسان
+JITTER = 0.2
+
+# محدودکننده‌های فعال برای نمایش در API وضعیت
+_active_limiters = weakref.WeakSet()
+
+
+class RateLimiter:
+    def __init__(self, min_interval, max_interval, name="", adaptive=True, burst=1):
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max_interval)
+        self.name = name
+        self.adaptive = adaptive
+        self.burst = burst
+        # حداقل تاخیر تنظیم شده توسط کاربر هیچ‌وقت زیر پا گذاشته نمی‌شود؛ حالت تطبیقی فقط بین آن و سقف حرکت می‌کند
+        self.floor = max(self.min_interval, MIN_INTERVAL_FLOOR)
+        self.interval = max((self.min_interval + self.max_interval) / 2, self.floor)
+        self.ceiling = max(MAX_INTERVAL_CEILING, self.max_interval)
+        self._tokens = float(burst)
+        self._updated = None
+        self._recent = deque(maxlen=RECENT_WINDOW)
+        self._lock = asyncio.Lock()
+        _active_limiters.add(self)
+
+    def _refill(self, now):
+        if self._updated is not None:
+            self._tokens = min(self._tokens + (now - self._updated) / self.interval, self.burst)
+        self._updated = now
+
+    async def acquire(self):
+        """انتظار تا وجود یک توکن؛ توکن‌ها با نرخ 1/interval (با نوسان تصادفی) پر می‌شوند"""
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            self._refill(loop.time())
+            if self._tokens < 1:
+                wait = (1 - self._tokens) * self.interval * uniform(1 - JITTER, 1 + JITTER)
+                add_log(f"   تاخیر {wait:.2f} ثانیه‌ای...")
+                await asyncio.sleep(wait)
+                self._refill(loop.time())
+            # کسری ناشی از نوسان به عنوان بدهی باقی می‌ماند تا نرخ میانگین حفظ شود
+            self._tokens -= 1
+
+    def record(self, success, latency):
+        """بازخورد نتیجه‌ی یک ارسال: ارسال سریع و موفق نرخ را بالا می‌برد و خطاهای پشت‌سرهم آن را نمایی پایین می‌آورند.
+        خطاهای دائمی (مثل کاربر ناموجود) نشانه‌ی فشار نیستند و نباید گزارش شوند"""
+        healthy = success and latency <= SLOW_LATENCY
+        self._recent.append(healthy)
+        if not self.adaptive:
+            return
+        
+        if healthy:
+            self.interval = max(self.interval * SPEEDUP_FACTOR, self.floor)
+        elif self._recent.count(False) >= 2:
+            self.interval = min(self.interval * BACKOFF_FACTOR, self.ceiling)
+            add_log(f"⚠️ خطاهای پشت‌سرهم؛ فاصله‌ی ارسال به {self.interval:.1f} ثانیه افزایش یافت")
+        else:
+            self.interval = min(self.interval * MILD_BACKOFF_FACTOR, self.ceiling)
+        state_notifier.notify()
+
+    def snapshot(self):
+        return {
+            "name": self.name,
+            "interval": round(self.interval, 2),
+            "rate_per_minute": round(60 / self.interval, 1),
+            "recent_failures": self._recent.count(False),
+            "adaptive": self.adaptive
+        }
+
+
+def active_rate_limits():
+    """وضعیت محدودکننده‌های در حال استفاده"""
+    return [limiter.snapshot() for limiter in list(_active_limiters)]
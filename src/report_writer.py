@@ -0,0 +1,75 @@
+"""
+نویسنده‌ی دسته‌ای گزارش‌های ارسال - حلقه‌ی ارسال هیچ‌وقت منتظر دیسک نمی‌ماند
+"""
+
+import asyncio
+
+from database import db
+
+
+class DispatchReportWriter:
+    def __init__(self, database, batch_size=100, flush_interval=1.0, queue_size=5000):
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        """راه‌اندازی تسک پس‌زمینه در صورت عدم اجرا"""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._writer_loop())
+
+    async def add(self, user_id, status, error_message, operation_type, message_content, phone_number):
+        """افزودن یک گزارش به صف نوشتن"""
+        self.start()
+        await self._queue.put({
+            "user_id": user_id,
+            "status": status,
+            "error_message": error_message,
+            "operation_type": operation_type,
+            "message_content": message_content,
+            "phone_number": phone_number
+        })
+
+    async def flush(self):
+        """انتظار تا نوشته شدن همه‌ی گزارش‌های صف"""
+        if self._queue is not None and self._task and not self._task.done():
+            await self._queue.join()
+
+    async def stop(self):
+        """نوشتن باقی‌مانده‌ی صف و توقف تسک"""
+        if not self._task:
+            return
+        await self.flush()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _writer_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await asyncio.to_thread(self.database.save_dispatch_reports, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+report_writer = DispatchReportWriter(db)
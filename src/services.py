@@ -3,58 +3,117 @@
 """
 
 import asyncio
-import random
 import io
 import pandas as pd
-from random import uniform
 from datetime import datetime
 import re
 
 from .state_manager import state, add_log
-from .browser_ops import ensure_browser, go_to_contacts_page, send_direct_message, add_single_contact, normalize_persian_text, extract_usernames_from_text
-from database import db
+from .browser_pool import browser_pool, ensure_browser, ensure_session_page, CLOSE_TIMEOUT
+from .browser_ops import open_eitaa, probe_login, save_storage_state, wait_for, LOGGED_IN_SELECTOR, LOGIN_FORM_SELECTOR, ADD_CONTACT_BUTTON_SELECTOR, MENU_BUTTON_SELECTOR, CONTACTS_MENU_ITEM_SELECTOR, open_extra_pages, close_pages, go_to_contacts_page, send_direct_message, add_single_contact, scan_history_for_prefix, extract_usernames_from_text
+from .report_writer import report_writer
+from .rate_limiter import RateLimiter
+from .peer_cache import peer_cache
+from .sessions import sessions
+from .failures import is_permanent, retry_delay, MAX_RETRIES, FAILURE_LABELS
+from database import db, targets_hash, REPORT_MESSAGE_LENGTH, SKIP_REASON_SENT, SKIP_REASON_FAILED
 
-async def automation_worker(phone, mode, group_name, keyword, msg, min_d, max_d, your_own_username):
+# فاصله‌ی عمدی بین افزودن دو مخاطب (ثانیه) - جدا از انتظارهای شرطی صفحه
+CONTACT_MIN_INTERVAL = 2
+CONTACT_MAX_INTERVAL = 4
+# تعداد تلاش‌های بازسازی صفحه‌ی از کار افتاده؛ از تلاش دوم مرورگر کامل دوباره اجرا می‌شود
+RECOVERY_ATTEMPTS = 2
+
+# بازسازی‌های همزمان (تب‌های یک کمپین یا حساب‌های مختلف) پشت سر هم انجام می‌شوند
+_recovery_lock = asyncio.Lock()
+
+def format_phone(phone):
+    """تبدیل شماره به قالب بین‌المللی (+98...)"""
+    formatted_phone = phone.strip()
+    if formatted_phone.startswith("0"):
+        formatted_phone = "+98" + formatted_phone[1:]
+    elif not formatted_phone.startswith("+"):
+        formatted_phone = "+98" + formatted_phone
+    return formatted_phone
+
+async def login_if_needed(page, phone, owner, timeout=15000):
+    """باز کردن ایتا و ورود به حساب در صورت نیاز؛ owner (state یا نشست حساب) محل انتظار برای کد تایید است"""
+    await open_eitaa(page)
+    if await probe_login(page, timeout):
+        add_log("حساب متصل است.")
+        return
+    
+    add_log("نیاز به ورود...")
+    phone_input = page.locator(LOGIN_FORM_SELECTOR).first
+    await phone_input.fill(phone)
+    await page.keyboard.press("Enter")
+    
+    owner.otp_required = True
+    owner.current_step = "منتظر کد تایید..."
+    owner.otp_event.clear()
+    await owner.otp_event.wait()
+    
+    await page.keyboard.type(owner.otp_code)
+    owner.otp_required = False
+    await page.wait_for_selector(LOGGED_IN_SELECTOR, timeout=60000)
+    await save_storage_state(page.context, phone)
+
+async def recover_page(page, phone, owner, session=None):
+    """جایگزینی صفحه‌ی کرش کرده یا قفل شده و بررسی دوباره‌ی ورود؛ خروجی: صفحه‌ی سالم برای ادامه‌ی کار.
+    اگر صفحه‌ی اصلی (state یا نشست حساب) خراب باشد بازسازی و تحویل می‌شود، وگرنه تب تازه‌ای در همان context باز می‌شود"""
+    async with _recovery_lock:
+        add_log(f"🩺 صفحه‌ی مرورگر ({phone}) از کار افتاده یا پاسخ نمی‌دهد؛ بازسازی...")
+        for attempt in range(RECOVERY_ATTEMPTS):
+            try:
+                if attempt:
+                    await browser_pool.restart_browser()
+                
+                main = session.page if session else state.page
+                if main is not page and await browser_pool.probe(main):
+                    try:
+                        await asyncio.wait_for(page.close(), CLOSE_TIMEOUT)
+                    except Exception:
+                        pass
+                    new_pages = await open_extra_pages(1, main.context)
+                    if not new_pages:
+                        continue
+                    new_page = new_pages[0]
+                else:
+                    if main is not None:
+                        await browser_pool.release(main)
+                        if session:
+                            session.page = None
+                        else:
+                            state.page = None
+                    new_page = await (ensure_session_page(session) if session else ensure_browser(phone))
+                    await login_if_needed(new_page, phone, owner)
+                
+                if await browser_pool.probe(new_page):
+                    add_log("✅ مرورگر بازسازی شد؛ کار از همان‌جا ادامه می‌یابد.")
+                    return new_page
+            except Exception as e:
+                add_log(f"⚠️ بازسازی مرورگر ناموفق بود: {str(e)[:100]}")
+        raise RuntimeError("بازسازی صفحه‌ی مرورگر ممکن نشد")
+
+async def automation_worker(phone, mode, group_name, keyword, msg, min_d, max_d, your_own_username, tabs=1):
     """کارگر اصلی اتوماسیون"""
     state.stop_requested = False
     state.dispatch_report.clear()
     add_log("🧹 گزارش قبلی پاک شد.")
+    report_writer.start()
     
     try:
-        page = await ensure_browser()
+        formatted_phone = format_phone(phone)
+        page = await ensure_browser(formatted_phone)
         state.is_running = True
         
-        formatted_phone = phone.strip()
-        if formatted_phone.startswith("0"):
-            formatted_phone = "+98" + formatted_phone[1:]
-        elif not formatted_phone.startswith("+"):
-            formatted_phone = "+98" + formatted_phone
-
         add_log(f"شروع با شماره: {formatted_phone}")
-        await page.goto("https://web.eitaa.com/", timeout=30000)
-        
-        try:
-            await page.wait_for_selector('#chatlist-container', timeout=15000)
-            add_log("حساب متصل است.")
-        except:
-            add_log("نیاز به ورود...")
-            phone_input = page.locator('input[name="phone_number"], .input-field-phone .input-field-input').first
-            await phone_input.fill(formatted_phone)
-            await page.keyboard.press("Enter")
-            
-            state.otp_required = True
-            state.current_step = "منتظر کد تایید..."
-            state.otp_event.clear()
-            await state.otp_event.wait()
-            
-            await page.keyboard.type(state.otp_code)
-            state.otp_required = False
-            await page.wait_for_selector('#chatlist-container', timeout=60000)
+        await login_if_needed(page, formatted_phone, state)
         
         if mode == "tahvil":
             return await handle_tahvil_mode(page, formatted_phone, group_name, keyword, msg, min_d, max_d, your_own_username)
         elif mode == "excel":
-            return await handle_excel_mode(page, formatted_phone, msg, min_d, max_d)
+            return await handle_excel_mode(page, formatted_phone, msg, min_d, max_d, tabs)
         elif mode == "login":
             add_log("ورود انجام شد.")
             return True
@@ -63,6 +122,7 @@ async def automation_worker(phone, mode, group_name, keyword, msg, min_d, max_d,
         add_log(f"❌ خطا در اجرای ربات: {str(e)}")
         return False
     finally:
+        await report_writer.flush()
         state.is_running = False
         state.current_step = "پایان یافت"
         add_log("ربات متوقف شد.")
@@ -76,8 +136,6 @@ async def handle_tahvil_mode(page, phone, group_name, keyword, msg, min_d, max_d
         search_input_locator = page.locator(main_search_input_selector)
         await search_input_locator.wait_for(state='visible', timeout=20000)
         await search_input_locator.click(timeout=10000)
-        await search_input_locator.fill("")
-        await page.wait_for_timeout(500)
         await search_input_locator.fill(group_name, timeout=10000)
         
         group_item_selector_main_search = f'li.rp.chatlist-chat:has(span.peer-title > i:text-is("{group_name}"))'
@@ -102,41 +160,25 @@ async def handle_tahvil_mode(page, phone, group_name, keyword, msg, min_d, max_d
         return False
 
     add_log(f"\n--- در حال جستجوی پیام‌های دارای پیشوند: '{keyword}' ---")
-    target_message_text = None
     
     try:
-        message_bubble_selector = "div.bubble"
-        message_text_in_bubble_selector = "div.message"
-        
-        chat_scrollable_area_locator = page.locator('//div[contains(@class, "bubbles")]/div[contains(@class, "scrollable-y")]').first
-        if await chat_scrollable_area_locator.count() > 0:
-            for _ in range(2):
-                await chat_scrollable_area_locator.evaluate("el => el.scrollTop = 0")
-                await asyncio.sleep(2)
-
-        all_message_bubbles = page.locator(message_bubble_selector)
-        count = await all_message_bubbles.count()
-        add_log(f"تعداد {count} حباب پیام در گروه یافت شد. در حال بررسی از آخر...")
+        last_mid = await asyncio.to_thread(db.get_scan_mark, group_name, keyword)
+        if last_mid:
+            add_log("فقط پیام‌های جدیدتر از اجرای قبلی بررسی می‌شوند.")
         
-        for i in range(count - 1, -1, -1):
-            single_bubble_locator = all_message_bubbles.nth(i)
-            message_text_locator = single_bubble_locator.locator(message_text_in_bubble_selector)
-            
-            if await message_text_locator.count() > 0:
-                try:
-                    text_content = await message_text_locator.inner_text(timeout=3000)
-                    text_to_check = normalize_persian_text(text_content.strip() if text_content else "")
-                    
-                    if text_to_check and keyword and text_to_check.startswith(keyword):
-                        target_message_text = text_content.strip()
-                        add_log(f"🎯 پیام هدف پیدا شد: '{target_message_text[:50]}...'")
-                        break
-                except:
-                    continue
+        target_message_text, newest_mid, scanned, complete = await scan_history_for_prefix(page, keyword, last_mid)
+        add_log(f"تعداد {scanned} پیام در گروه بررسی شد.")
         
         if not target_message_text: 
             add_log(f"⚠️ پیام با پیشوند '{keyword}' در گروه '{group_name}' پیدا نشد.")
+            if complete:
+                await asyncio.to_thread(db.save_scan_mark, group_name, keyword, newest_mid)
+            else:
+                # پیام‌های بین نشانه‌ی قبلی و محل توقف بررسی نشده‌اند؛ اجرای بعدی دوباره آن‌ها را می‌خواند
+                add_log("ℹ️ بررسی تاریخچه کامل نشد؛ نقطه‌ی شروع اجرای بعدی تغییر نکرد.")
             return False
+        
+        add_log(f"🎯 پیام هدف پیدا شد: '{target_message_text[:50]}...'")
             
     except Exception as e_find_msg:
         add_log(f"❌ خطایی در هنگام جستجوی پیام هدف در گروه '{group_name}' رخ داد: {e_find_msg}")
@@ -147,6 +189,7 @@ async def handle_tahvil_mode(page, phone, group_name, keyword, msg, min_d, max_d
     
     if not found_users:
         add_log("⚠️ هیچ نام کاربری (@username) در پیام پیدا نشد.")
+        await asyncio.to_thread(db.save_scan_mark, group_name, keyword, newest_mid)
         return False
 
     hashtagged_prefix = f"#{keyword}"
@@ -154,111 +197,248 @@ async def handle_tahvil_mode(page, phone, group_name, keyword, msg, min_d, max_d
     
     add_log(f"🎯 {len(found_users)} کاربر برای ارسال پیام پیدا شد.")
     
+    targets = []
     for user_with_at in found_users:
-        if state.stop_requested:
-            add_log("توقف درخواست شده.")
-            break
-            
         clean_username = user_with_at.lstrip('@')
         
         if your_own_username and clean_username.lower() == your_own_username.lower():
             add_log(f"ℹ️ از ارسال پیام به '{user_with_at}' (خودتان) صرف نظر شد.")
             
-            state.dispatch_report.append({
-                "id": user_with_at,
-                "status": "skipped",
-                "error": "نام کاربری خودتان - صرف نظر شد",
-                "timestamp": datetime.now().strftime("%H:%M:%S")
-            })
-            
-            db.save_dispatch_report(
-                user_id=user_with_at,
-                status="skipped",
-                error_message="نام کاربری خودتان - صرف نظر شد",
-                operation_type="tahvil",
-                message_content=final_message_to_send[:500],
-                phone_number=phone
-            )
+            await record_dispatch(user_with_at, "skipped", "نام کاربری خودتان - صرف نظر شد", "tahvil", final_message_to_send, phone)
             continue
+        targets.append(user_with_at)
+    
+    await asyncio.to_thread(peer_cache.preload, targets)
+    campaign_id = await open_campaign("tahvil", final_message_to_send, phone, targets)
+    try:
+        limiter = RateLimiter(min_d, max_d, name="tahvil")
+        await campaign_send_worker(page, campaign_id, limiter, phone, final_message_to_send, "tahvil")
+    finally:
+        await close_campaign(campaign_id)
+    
+    if state.stop_requested:
+        add_log("توقف درخواست شده.")
+    else:
+        # پیام پردازش شد؛ اجرای بعدی از پیام‌های جدیدتر شروع می‌کند
+        await asyncio.to_thread(db.save_scan_mark, group_name, keyword, newest_mid)
+    
+    add_log("🎉 عملیات ارسال پیام‌ها به پایان رسید.")
+    return True
+
+async def record_dispatch(user_id, status, error_msg, operation_type, message_content, phone):
+    """ثبت نتیجه‌ی ارسال در گزارش حافظه و صف نوشتن دیتابیس"""
+    entry = {
+        "id": user_id,
+        "status": status,
+        "error": error_msg,
+        "timestamp": datetime.now().strftime("%H:%M:%S")
+    }
+    state.dispatch_report.append(entry)
+    
+    await report_writer.add(
+        user_id=user_id,
+        status=status,
+        error_message=error_msg,
+        operation_type=operation_type,
+        message_content=message_content[:REPORT_MESSAGE_LENGTH],
+        phone_number=phone
+    )
+
+async def open_campaign(operation_type, msg, phone, targets):
+    """ایجاد یا ادامه‌ی کمپین ماندگار و گزارش وضعیت آن؛ گیرندگانی که همین پیام را گرفته‌اند حذف می‌شوند"""
+    # ادامه‌ی کمپین بر اساس لیست اصلی است، چون لیست پس از حذف دریافت‌کنندگان قبلی در هر اجرا کوچک‌تر می‌شود
+    list_hash = targets_hash(targets)
+    unsent, skipped = await asyncio.to_thread(db.filter_unsent_recipients, targets, msg)
+    if skipped:
+        add_log(f"⏭️ {skipped} گیرنده این پیام را قبلاً دریافت کرده‌اند و از کمپین حذف شدند.")
+    reachable, unreachable = await asyncio.to_thread(db.filter_permanent_failures, unsent)
+    if unreachable:
+        add_log(f"⏭️ {unreachable} گیرنده در کمپین‌های قبلی خطای دائمی داشته‌اند (مثلاً کاربر ناموجود) و حذف شدند.")
+    unsent, kept = set(unsent), set(reachable)
+    removed = [(u, SKIP_REASON_FAILED if u in unsent else SKIP_REASON_SENT) for u in targets if u not in kept]
+    campaign_id, resumed = await asyncio.to_thread(db.start_campaign, operation_type, msg, phone, reachable, removed, list_hash)
+    if resumed:
+        progress = await asyncio.to_thread(db.get_campaign_progress, campaign_id)
+        add_log(f"↩️ ادامه‌ی کمپین قبلی: {progress['sent']} ارسال شده، {progress['failed']} ناموفق، {progress['pending']} باقی‌مانده، {progress['retry']} در صف تلاش مجدد")
+    return campaign_id
+
+async def close_campaign(campaign_id):
+    status = await asyncio.to_thread(db.finish_campaign, campaign_id)
+    if status == 'stopped':
+        add_log("⏸️ کمپین ناتمام ماند؛ اجرای دوباره با همین پیام از همین‌جا ادامه می‌دهد.")
+
+async def _claim_next_target(campaign_id, owner):
+    """هدف بعدی کمپین: ابتدا صف اصلی، سپس صف تلاش مجدد با رعایت فاصله‌ی مخصوص دسته‌ی خطا.
+    خروجی: (هدف، تعداد تلاش‌های قبلی) یا (None، 0)"""
+    user = await asyncio.to_thread(db.claim_campaign_target, campaign_id)
+    if user is not None:
+        return user, 0
+    
+    target = await asyncio.to_thread(db.claim_retry_target, campaign_id)
+    if target is None:
+        return None, 0
+    
+    wait = retry_delay(target["failure_kind"], target["attempts"]) - target["elapsed"]
+    if wait > 0:
+        add_log(f"🔁 تلاش مجدد برای {target['user_id']} ({FAILURE_LABELS.get(target['failure_kind'], target['failure_kind'])}) پس از {wait:.0f} ثانیه...")
+    while wait > 0 and not owner.stop_requested:
+        await asyncio.sleep(min(wait, 1))
+        wait -= 1
+    return target["user_id"], target["attempts"]
+
+async def campaign_send_worker(page, campaign_id, limiter, phone, msg, operation_type, session=None):
+    """کارگر ارسال روی یک تب - هدف بعدی را از صف ماندگار کمپین برمی‌دارد؛
+    خطاهای گذرا در پایان کمپین دوباره امتحان و خطاهای دائمی برای کمپین‌های بعدی ذخیره می‌شوند"""
+    owner = session or state
+    while not owner.stop_requested:
+        # صفحه‌ی مرده به جای هدر دادن مهلت‌های ارسال، پیش از برداشتن هدف بعدی بازسازی می‌شود
+        if not await browser_pool.probe(page):
+            page = await recover_page(page, phone, owner, session)
+        
+        user, attempts = await _claim_next_target(campaign_id, owner)
+        if user is None:
+            return
+        
+        if not owner.stop_requested:
+            await limiter.acquire()
+        if owner.stop_requested:
+            await asyncio.to_thread(db.complete_campaign_target, campaign_id, user, "retry" if attempts else "pending")
+            return
         
-        success, message = await send_direct_message(page, user_with_at, final_message_to_send, min_d, max_d, "tahvil", phone)
+        started = asyncio.get_running_loop().time()
+        success, message, kind = await send_direct_message(page, user, msg, operation_type, phone)
+        if not is_permanent(kind):
+            limiter.record(success, asyncio.get_running_loop().time() - started)
         
         if success:
-            status = "success"
-            error_msg = "ارسال با موفقیت انجام شد."
+            await asyncio.to_thread(db.complete_campaign_target, campaign_id, user, "sent")
+            await record_dispatch(user, "success", "ارسال با موفقیت انجام شد.", operation_type, msg, phone)
+        elif not is_permanent(kind) and attempts < MAX_RETRIES:
+            # خطای گذرا: فقط در پایان کمپین دوباره امتحان می‌شود و هنوز در گزارش ثبت نمی‌شود
+            await asyncio.to_thread(db.complete_campaign_target, campaign_id, user, "retry", message, kind)
+            continue
         else:
-            status = "failed"
-            error_msg = message
-        
-        state.dispatch_report.append({
-            "id": user_with_at,
-            "status": status,
-            "error": error_msg,
-            "timestamp": datetime.now().strftime("%H:%M:%S")
-        })
-        
-        db.save_dispatch_report(
-            user_id=user_with_at,
-            status=status,
-            error_message=error_msg,
-            operation_type="tahvil",
-            message_content=final_message_to_send[:500],
-            phone_number=phone
-        )
+            await asyncio.to_thread(db.complete_campaign_target, campaign_id, user, "failed", message, kind, is_permanent(kind))
+            await record_dispatch(user, "failed", message, operation_type, msg, phone)
         
-        delay_seconds = uniform(float(min_d), float(max_d))
-        add_log(f"   تاخیر {delay_seconds:.2f} ثانیه‌ای...")
-        await page.wait_for_timeout(int(delay_seconds * 1000))
-    
-    add_log("🎉 عملیات ارسال پیام‌ها به پایان رسید.")
-    return True
+        if session:
+            if success:
+                session.sent_count += 1
+            else:
+                session.failed_count += 1
 
-async def handle_excel_mode(page, phone, msg, min_d, max_d):
-    """مدیریت حالت ارسال از اکسل"""
+async def run_tab_workers(workers):
+    """اجرای همزمان کارگرهای تب‌ها؛ با خطای یکی (یا لغو) بقیه لغو و منتظر می‌مانند تا پس از بازگشت هیچ ارسالی ادامه نیابد"""
+    tasks = [asyncio.create_task(worker) for worker in workers]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def handle_excel_mode(page, phone, msg, min_d, max_d, tabs=1):
+    """مدیریت حالت ارسال از اکسل (چند تب همزمان با نرخ ارسال مشترک)"""
     add_log(f"شروع ارسال به {len(state.target_list)} کاربر از اکسل")
     
     if not state.target_list:
         add_log("⚠️ لیست کاربران از اکسل خالی است.")
         return False
     
-    for user in state.target_list:
-        if state.stop_requested:
-            break
-            
-        if not user.startswith('@'):
-            user = '@' + user
-            
-        success, message = await send_direct_message(page, user, msg, min_d, max_d, "excel", phone)
-        
-        if success:
-            status = "success"
-            error_msg = "ارسال با موفقیت انجام شد."
-        else:
-            status = "failed"
-            error_msg = message
-        
-        state.dispatch_report.append({
-            "id": user,
-            "status": status,
-            "error": error_msg,
-            "timestamp": datetime.now().strftime("%H:%M:%S")
-        })
-        
-        db.save_dispatch_report(
-            user_id=user,
-            status=status,
-            error_message=error_msg,
-            operation_type="excel",
-            message_content=msg[:500],
-            phone_number=phone
+    targets = [user if user.startswith('@') else '@' + user for user in state.target_list]
+    await asyncio.to_thread(peer_cache.preload, targets)
+    campaign_id = await open_campaign("excel", msg, phone, targets)
+    
+    limiter = RateLimiter(min_d, max_d, name="excel")
+    tabs = max(1, min(int(tabs or 1), len(targets)))
+    extra_pages = await open_extra_pages(tabs - 1) if tabs > 1 else []
+    
+    try:
+        await run_tab_workers(
+            campaign_send_worker(p, campaign_id, limiter, phone, msg, "excel")
+            for p in [page] + extra_pages
         )
-        
-        delay_seconds = uniform(float(min_d), float(max_d))
-        add_log(f"   تاخیر {delay_seconds:.2f} ثانیه‌ای...")
-        await page.wait_for_timeout(int(delay_seconds * 1000))
+    finally:
+        # تب‌های اضافه (از جمله تب‌هایی که پس از کرش دوباره باز شده‌اند) همگی در context صفحه‌ی اصلی‌اند
+        if state.page:
+            extra_pages = [p for p in state.page.context.pages if p is not state.page]
+        await close_pages(extra_pages)
+        await close_campaign(campaign_id)
     
     return True
 
+async def run_account_campaign(session, targets, msg, min_d, max_d):
+    """ارسال سهم یک حساب از کمپین با context و محدودکننده‌ی نرخ خودش"""
+    session.stop_requested = False
+    session.is_running = True
+    session.targets_total = len(targets)
+    session.sent_count = 0
+    session.failed_count = 0
+    
+    try:
+        page = await ensure_session_page(session)
+        session.current_step = "در حال ورود..."
+        add_log(f"[{session.phone}] شروع ارسال به {len(targets)} کاربر")
+        await login_if_needed(page, session.phone, session)
+        
+        session.current_step = "در حال ارسال..."
+        campaign_id = await open_campaign("excel", msg, session.phone, targets)
+        session.limiter = RateLimiter(min_d, max_d, name=f"excel {session.phone}")
+        try:
+            await campaign_send_worker(page, campaign_id, session.limiter, session.phone, msg, "excel", session)
+        finally:
+            await close_campaign(campaign_id)
+        
+        add_log(f"[{session.phone}] ✅ پایان: {session.sent_count} موفق، {session.failed_count} ناموفق")
+        return True
+    except Exception as e:
+        add_log(f"[{session.phone}] ❌ خطا در ارسال: {str(e)}")
+        return False
+    finally:
+        # context حساب پس از کمپین بسته می‌شود؛ ورود در فایل نشست ذخیره شده و کمپین بعدی آن را بازیابی می‌کند
+        if session.page:
+            await browser_pool.release(session.page)
+        session.page = None
+        session.context = None
+        session.limiter = None
+        session.is_running = False
+        session.current_step = "پایان یافت"
+
+async def campaign_worker(phones, msg, min_d, max_d):
+    """کمپین چندحسابی: تقسیم لیست کاربران بین حساب‌ها و ارسال همزمان"""
+    state.stop_requested = False
+    state.dispatch_report.clear()
+    report_writer.start()
+    
+    phones = list(dict.fromkeys(format_phone(p) for p in phones))
+    targets = [u if u.startswith('@') else '@' + u for u in state.target_list]
+    # تقسیم چرخشی تا سهم حساب‌ها حداکثر یک نفر اختلاف داشته باشد
+    shards = [targets[i::len(phones)] for i in range(len(phones))]
+    await asyncio.to_thread(peer_cache.preload, targets)
+    
+    state.is_running = True
+    state.current_step = f"کمپین چندحسابی ({len(phones)} حساب)"
+    add_log(f"شروع کمپین: {len(targets)} کاربر بین {len(phones)} حساب تقسیم شد")
+    
+    try:
+        results = await asyncio.gather(*(
+            run_account_campaign(sessions.get_or_create(phone), shard, msg, min_d, max_d)
+            for phone, shard in zip(phones, shards) if shard
+        ))
+        add_log(f"🎉 کمپین پایان یافت ({sum(1 for r in results if r)} از {len(results)} حساب موفق)")
+        return all(results)
+    finally:
+        await report_writer.flush()
+        state.is_running = False
+        state.current_step = "پایان یافت"
+
+async def _recover_contacts_page(page, phone):
+    """بازسازی صفحه و بازگشت به صفحه‌ی مخاطبین"""
+    page = await recover_page(page, phone, state)
+    if not await go_to_contacts_page(page):
+        raise RuntimeError("بازگشت به صفحه‌ی مخاطبین پس از بازسازی مرورگر ممکن نشد")
+    return page
+
 async def add_contacts_worker(phone):
     """کارگر افزودن مخاطبین"""
     state.contacts_is_running = True
@@ -271,47 +451,22 @@ async def add_contacts_worker(phone):
     state.contacts_error = None
     
     try:
-        page = await ensure_browser()
+        formatted_phone = format_phone(phone)
+        page = await ensure_browser(formatted_phone)
         
-        formatted_phone = phone.strip()
-        if formatted_phone.startswith("0"):
-            formatted_phone = "+98" + formatted_phone[1:]
-        elif not formatted_phone.startswith("+"):
-            formatted_phone = "+98" + formatted_phone
-
         add_log(f"شروع افزودن مخاطبین با شماره: {formatted_phone}")
         add_log(f"📊 {len(state.filtered_contacts_list)} مخاطب جدید، {state.duplicate_contacts_count} مخاطب تکراری")
         state.contacts_status = "در حال ورود به ایتا..."
-        
-        await page.goto("https://web.eitaa.com/", timeout=30000)
-        
-        try:
-            await page.wait_for_selector('#chatlist-container', timeout=10000)
-            add_log("حساب متصل است.")
-        except:
-            add_log("نیاز به ورود...")
-            phone_input = page.locator('input[name="phone_number"], .input-field-phone .input-field-input').first
-            await phone_input.fill(formatted_phone)
-            await page.keyboard.press("Enter")
-            
-            state.otp_required = True
-            state.current_step = "منتظر کد تایید..."
-            state.otp_event.clear()
-            await state.otp_event.wait()
-            
-            await page.keyboard.type(state.otp_code)
-            state.otp_required = False
-            await page.wait_for_selector('#chatlist-container', timeout=60000)
+        await login_if_needed(page, formatted_phone, state, timeout=10000)
         
         state.contacts_status = "در حال باز کردن منو..."
         add_log("باز کردن منوی همبرگر...")
         
         try:
-            menu_button = page.locator('div.btn-icon.btn-menu-toggle.rp.sidebar-tools-button.is-visible').first
+            menu_button = page.locator(MENU_BUTTON_SELECTOR).first
             await menu_button.wait_for(state='visible', timeout=4000)
             await menu_button.click(timeout=3000)
             add_log("منوی همبرگر باز شد.")
-            await asyncio.sleep(3)
             
         except Exception as e:
             error_msg = f"خطا در باز کردن منو: {str(e)}"
@@ -324,14 +479,12 @@ async def add_contacts_worker(phone):
         add_log("کلیک روی گزینه مخاطبین...")
         
         try:
-            contacts_option = page.locator('div.btn-menu-item.tgico-user.rp').first
+            contacts_option = page.locator(CONTACTS_MENU_ITEM_SELECTOR).first
             await contacts_option.wait_for(state='visible', timeout=3000)
             await contacts_option.click(timeout=2000)
             add_log("گزینه مخاطبین انتخاب شد.")
-            await asyncio.sleep(3)
             
-            add_contact_btn = page.locator('button.btn-circle.btn-corner.tgico-add.rp').first
-            if await add_contact_btn.count() > 0:
+            if await wait_for(page, ADD_CONTACT_BUTTON_SELECTOR):
                 add_log("✓ صفحه مخاطبین بارگذاری شد")
             else:
                 add_log("⚠️ صفحه مخاطبین ممکن است کامل بارگذاری نشده باشد")
@@ -345,20 +498,50 @@ async def add_contacts_worker(phone):
         
         state.contacts_status = "در حال افزودن مخاطبین..."
         
+        limiter = RateLimiter(CONTACT_MIN_INTERVAL, CONTACT_MAX_INTERVAL, name="contacts")
+        loop = asyncio.get_running_loop()
+        # (اندیس، مخاطب، دسته‌ی خطا، تعداد تلاش، زمان خطا) برای مخاطبینی که خطای گذرا داشته‌اند
+        retries = []
         for i, contact in enumerate(state.filtered_contacts_list):
-            success = await add_single_contact(page, contact, i, state.contacts_total, phone)
+            if not await browser_pool.probe(page):
+                page = await _recover_contacts_page(page, formatted_phone)
+            await limiter.acquire()
+            started = loop.time()
+            success, kind = await add_single_contact(page, contact, i, state.contacts_total, phone)
+            if not is_permanent(kind):
+                limiter.record(success, loop.time() - started)
             
             if success:
                 state.contacts_success_count += 1
-            else:
+            elif is_permanent(kind):
                 state.contacts_failed_count += 1
+            else:
+                retries.append((i, contact, kind, 1, loop.time()))
             
             state.contacts_progress = i + 1
+        
+        if retries:
+            add_log(f"🔁 تلاش مجدد برای {len(retries)} مخاطب با خطای گذرا...")
+        while retries and not state.stop_requested:
+            i, contact, kind, attempts, failed_at = retries.pop(0)
+            wait = retry_delay(kind, attempts) - (loop.time() - failed_at)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if not await browser_pool.probe(page):
+                page = await _recover_contacts_page(page, formatted_phone)
+            await limiter.acquire()
+            started = loop.time()
+            success, kind = await add_single_contact(page, contact, i, state.contacts_total, phone)
+            if not is_permanent(kind):
+                limiter.record(success, loop.time() - started)
             
-            if i < state.contacts_total - 1:
-                delay = random.uniform(2, 4)
-                add_log(f"⏳ تاخیر {delay:.1f} ثانیه تا مخاطب بعدی...")
-                await asyncio.sleep(delay)
+            if success:
+                state.contacts_success_count += 1
+            elif is_permanent(kind) or attempts >= MAX_RETRIES:
+                state.contacts_failed_count += 1
+            else:
+                retries.append((i, contact, kind, attempts + 1, loop.time()))
+        state.contacts_failed_count += len(retries)
         
         state.contacts_status = "عملیات تکمیل شد"
         state.contacts_completed = True
@@ -375,21 +558,54 @@ async def add_contacts_worker(phone):
         state.contacts_is_running = False
         state.contacts_status = "پایان یافت"
 
-def process_contacts_excel(contents):
-    """پردازش فایل اکسل مخاطبین"""
+def _iter_excel_rows(contents, status):
+    """خواندن جریانی سطرهای اکسل (بدون سطر عنوان) در حالت read-only و به‌روزرسانی پیشرفت"""
+    import openpyxl
+    from io import BytesIO
+    
+    wb = openpyxl.load_workbook(BytesIO(contents), read_only=True, data_only=True)
     try:
-        import openpyxl
-        from io import BytesIO
-        
-        wb = openpyxl.load_workbook(BytesIO(contents))
         ws = wb.active
+        state.upload_is_running = True
+        state.upload_status = status
+        state.upload_processed = 0
+        state.upload_total = max((ws.max_row or 1) - 1, 0)
         
+        for idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+            state.upload_processed = idx - 1
+            yield idx, row
+    finally:
+        wb.close()
+        state.upload_is_running = False
+        state.upload_status = "پایان یافت"
+
+def parse_usernames_excel(contents):
+    """استخراج نام‌های کاربری از ستون اول فایل اکسل - برای اجرا در ترد جدا"""
+    usernames = []
+    for idx, row in _iter_excel_rows(contents, "در حال خواندن فایل کاربران..."):
+        value = row[0] if row else None
+        if value is None:
+            continue
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        
+        username = str(value).strip()
+        if not username:
+            continue
+        if not username.startswith('@'):
+            username = '@' + username
+        usernames.append(username)
+    return usernames
+
+def process_contacts_excel(contents):
+    """پردازش فایل اکسل مخاطبین - برای اجرا در ترد جدا"""
+    try:
         contacts = []
         valid_count = 0
         invalid_count = 0
         
-        for idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-            if not any(row):
+        for idx, row in _iter_excel_rows(contents, "در حال پردازش فایل مخاطبین..."):
+            if not row or not any(row):
                 continue
                 
             try:
@@ -445,7 +661,6 @@ def process_contacts_excel(contents):
                         "phone": phone
                     })
                     valid_count += 1
-                    add_log(f"✓ سطر {idx}: '{name[:20]}...' - '{phone}' پذیرفته شد")
                     
                 else:
                     invalid_count += 1
@@ -0,0 +1,81 @@
+"""
+رجیستری نشست‌های حساب - هر شماره تلفن context مرورگر و وضعیت جداگانه‌ی خود را دارد
+"""
+
+import asyncio
+
+from .state_manager import state_notifier
+
+# ویژگی‌هایی از نشست که تغییرشان برای رابط کاربری اهمیتی ندارد
+SESSION_SILENT_ATTRS = {"otp_event", "context", "page", "limiter"}
+
+class AccountSession:
+    """وضعیت یک حساب ایتا در کمپین چندحسابی"""
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name not in SESSION_SILENT_ATTRS:
+            state_notifier.notify()
+    
+    def __init__(self, phone):
+        self.phone = phone
+        self.context = None
+        self.page = None
+        self.limiter = None
+        self.is_running = False
+        self.stop_requested = False
+        self.current_step = "آماده"
+        self.otp_required = False
+        self.otp_event = asyncio.Event()
+        self.otp_code = None
+        self.targets_total = 0
+        self.sent_count = 0
+        self.failed_count = 0
+    
+    def snapshot(self):
+        return {
+            "phone": self.phone,
+            "is_running": self.is_running,
+            "current_step": self.current_step,
+            "otp_required": self.otp_required,
+            "targets_total": self.targets_total,
+            "sent_count": self.sent_count,
+            "failed_count": self.failed_count
+        }
+
+class SessionRegistry:
+    """نگه‌داری نشست‌ها به تفکیک شماره تلفن"""
+    def __init__(self):
+        self._sessions = {}
+    
+    def get(self, phone):
+        return self._sessions.get(phone)
+    
+    def get_or_create(self, phone):
+        session = self._sessions.get(phone)
+        if session is None:
+            session = AccountSession(phone)
+            self._sessions[phone] = session
+        return session
+    
+    def all(self):
+        return list(self._sessions.values())
+    
+    def is_running(self):
+        return any(s.is_running for s in self._sessions.values())
+    
+    def awaiting_otp(self):
+        """اولین نشستی که منتظر کد تایید است"""
+        for session in self._sessions.values():
+            if session.otp_required:
+                return session
+        return None
+    
+    def stop_all(self):
+        for session in self._sessions.values():
+            session.stop_requested = True
+    
+    def snapshot(self):
+        return [s.snapshot() for s in self._sessions.values()]
+
+# ایجاد نمونه global از رجیستری نشست‌ها
+sessions = SessionRegistry()
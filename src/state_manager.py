@@ -3,12 +3,86 @@
 """
 
 import asyncio
+import threading
+from collections import deque
+from itertools import islice
 from datetime import datetime
 
+# حداکثر تعداد خطوط لاگ نگه‌داری شده در حافظه
+LOG_CAPACITY = 1000
+
+# ویژگی‌هایی که تغییرشان برای رابط کاربری اهمیتی ندارد
+SILENT_ATTRS = {"log_seq", "log_lock", "otp_event", "playwright_engine", "browser", "context", "context_phone", "page"}
+
+class StateSubscription:
+    """یک مشترک تغییرات state (مثلاً یک اتصال SSE)"""
+    def __init__(self, notifier):
+        self.notifier = notifier
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+        self._pending = False
+    
+    def _wake(self):
+        # از هر تردی قابل فراخوانی است؛ تا بیدار شدن مشترک فقط یک بار زمان‌بندی می‌شود
+        if self._pending:
+            return
+        self._pending = True
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            pass
+    
+    async def wait(self, timeout):
+        """انتظار برای تغییر بعدی؛ در صورت پایان مهلت False برمی‌گرداند"""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        self._pending = False
+        return True
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.notifier.unsubscribe(self)
+
+class StateNotifier:
+    """اطلاع‌رسانی تغییرات state و لاگ‌ها به مشترکین"""
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+    
+    def subscribe(self):
+        subscription = StateSubscription(self)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+    
+    def notify(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription._wake()
+
+state_notifier = StateNotifier()
+
 class BotState:
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name not in SILENT_ATTRS:
+            state_notifier.notify()
+    
     def __init__(self):
         self.is_running = False
-        self.logs = []
+        self.logs = deque(maxlen=LOG_CAPACITY)  # (seq, line) به ترتیب زمانی
+        self.log_seq = 0
+        self.log_lock = threading.Lock()
         self.current_step = "آماده"
         self.otp_required = False
         self.otp_event = asyncio.Event()
@@ -17,6 +91,7 @@ class BotState:
         self.playwright_engine = None
         self.browser = None
         self.context = None
+        self.context_phone = None
         self.page = None
         self.stop_requested = False
         self.ready_messages = []
@@ -34,6 +109,12 @@ class BotState:
         self.contacts_failed_count = 0
         self.contacts_error = None
         self.contacts_is_running = False
+        
+        # وضعیت پردازش فایل‌های آپلود شده (در ترد جدا اجرا می‌شود)
+        self.upload_is_running = False
+        self.upload_status = "آماده"
+        self.upload_processed = 0
+        self.upload_total = 0
 
 # ایجاد نمونه global از state
 state = BotState()
@@ -41,5 +122,18 @@ state = BotState()
 def add_log(msg):
     """افزودن لاگ به سیستم"""
     timestamp = datetime.now().strftime("%H:%M:%S")
-    state.logs.insert(0, f"[{timestamp}] {msg}")
-    print(f"LOG: [{timestamp}] {msg}")
\ No newline at end of file
+    with state.log_lock:
+        state.log_seq += 1
+        state.logs.append((state.log_seq, f"[{timestamp}] {msg}"))
+    state_notifier.notify()
+    print(f"LOG: [{timestamp}] {msg}")
+
+def get_logs_since(since=0):
+    """لاگ‌های جدیدتر از شماره‌ی داده شده (به ترتیب زمانی) و آخرین شماره"""
+    with state.log_lock:
+        last_seq = state.log_seq
+        if not state.logs or since >= last_seq:
+            return [], last_seq
+        # شماره‌ها پیوسته‌اند، پس محل شروع مستقیماً محاسبه می‌شود
+        start = max(since - state.logs[0][0] + 1, 0)
+        return [line for _, line in islice(state.logs, start, None)], last_seq
\ No newline at end of file
@@ -46,6 +46,7 @@ async function startAction(mode) {
 
     // برای عملیات دیگر
     const formData = new FormData();
+    let campaignPhones = '';
     formData.append('phone_number', phone);
     formData.append('mode', mode);
     
@@ -65,6 +66,14 @@ async function startAction(mode) {
         formData.append('msg', document.getElementById('excel_msg').value || '');
         formData.append('min_d', document.getElementById('min_delay').value || 7);
         formData.append('max_d', document.getElementById('max_delay').value || 12);
+        formData.append('tabs', document.getElementById('send_tabs_excel').value || 1);
+        
+        // کمپین چندحسابی: لیست کاربران بین شماره‌ی اصلی و شماره‌های اضافه تقسیم می‌شود
+        const extraPhones = document.getElementById('campaign_phones').value.trim();
+        if (extraPhones) {
+            campaignPhones = phone + ',' + extraPhones;
+            formData.append('phones', campaignPhones);
+        }
         
         // آپلود فایل
         const uploadResponse = await fetch('/upload-excel', {
@@ -79,7 +88,7 @@ async function startAction(mode) {
     }
 
     try {
-        const endpoint = mode === 'login' ? '/login' : '/start';
+        const endpoint = mode === 'login' ? '/login' : (campaignPhones ? '/start-campaign' : '/start');
         const response = await fetch(endpoint, {
             method: 'POST', 
             body: formData
@@ -111,6 +120,7 @@ async function sendOTP() {
 
     const params = new URLSearchParams();
     params.append('code', code);
+    if (otpPhone) params.append('phone', otpPhone);
     
     try {
         const response = await fetch('/submit-otp', {
@@ -319,21 +329,56 @@ function selectReadyMessage(messageText) {
 }
 
 // =================================== 5. Dispatch Report Functions ===================================
+let reportNextCursor = null;
+let reportSummary = null;
+
 /**
- * بارگذاری و نمایش گزارش ارسال عملیات
+ * ساخت پارامترهای فیلتر گزارش از فرم
+ * @returns {URLSearchParams}
  */
-async function loadDispatchReport() {
+function getReportFilterParams() {
+    const params = new URLSearchParams();
+    const filters = {
+        status: 'report_filter_status',
+        operation_type: 'report_filter_operation',
+        phone_number: 'report_filter_phone',
+        date_from: 'report_filter_date_from',
+        date_to: 'report_filter_date_to'
+    };
+    for (const [key, elementId] of Object.entries(filters)) {
+        const element = document.getElementById(elementId);
+        if (element && element.value.trim()) params.append(key, element.value.trim());
+    }
+    return params;
+}
+
+/**
+ * بارگذاری و نمایش گزارش ارسال عملیات (صفحه‌بندی با cursor)
+ * @param {boolean} append - افزودن صفحه بعدی به جدول به جای بارگذاری مجدد
+ */
+async function loadDispatchReport(append = false) {
     const tableBody = document.getElementById('report_table_body');
     const summary = document.getElementById('report_summary');
+    const loadMoreButton = document.getElementById('report_load_more');
     
-    tableBody.innerHTML = `<tr><td colspan="3" class="px-6 py-4 whitespace-nowrap text-sm text-center text-gray-500">در حال بارگذاری گزارش...</td></tr>`;
+    if (!append) {
+        reportNextCursor = null;
+        reportSummary = null;
+        tableBody.innerHTML = `<tr><td colspan="3" class="px-6 py-4 whitespace-nowrap text-sm text-center text-gray-500">در حال بارگذاری گزارش...</td></tr>`;
+    }
 
     try {
-        const res = await fetch('/get-dispatch-report');
+        const params = getReportFilterParams();
+        if (append && reportNextCursor) params.append('cursor', reportNextCursor);
+        
+        const res = await fetch(`/get-dispatch-report?${params.toString()}`);
         const data = await res.json();
         const report = data.report;
         
-        if (!report || report.length === 0) {
+        reportNextCursor = data.next_cursor || null;
+        if (loadMoreButton) loadMoreButton.classList.toggle('hidden', !reportNextCursor);
+        
+        if (!append && (!report || report.length === 0)) {
             tableBody.innerHTML = `<tr><td colspan="3" class="px-6 py-4 whitespace-nowrap text-sm text-center text-gray-500">گزارشی وجود ندارد. عملیات را شروع کنید.</td></tr>`;
             summary.innerText = "وضعیت کلی: گزارشی یافت نشد.";
             return;
@@ -389,8 +434,16 @@ async function loadDispatchReport() {
             `;
         }).join('');
 
-        tableBody.innerHTML = reportHtml;
-        summary.innerHTML = `وضعیت کلی: <span class="text-green-600 font-bold">${successCount} موفق</span> / <span class="text-red-600 font-bold">${failedCount} ناموفق</span> / <span class="text-yellow-600 font-bold">${skippedCount} رد شده</span> (کل: ${report.length}) - <span class="text-blue-600 text-xs">${data.source === 'database' ? 'از دیتابیس' : 'از حافظه موقت'}</span>`;
+        if (append) {
+            tableBody.insertAdjacentHTML('beforeend', reportHtml);
+        } else {
+            tableBody.innerHTML = reportHtml;
+        }
+        
+        // خلاصه از سرور (برای کل نتایج فیلتر) یا شمارش همین صفحه برای گزارش حافظه موقت
+        if (data.summary) reportSummary = data.summary;
+        const counts = reportSummary || {success: successCount, failed: failedCount, skipped: skippedCount, total: report.length};
+        summary.innerHTML = `وضعیت کلی: <span class="text-green-600 font-bold">${counts.success || 0} موفق</span> / <span class="text-red-600 font-bold">${counts.failed || 0} ناموفق</span> / <span class="text-yellow-600 font-bold">${counts.skipped || 0} رد شده</span> (کل: ${counts.total || 0}) - <span class="text-blue-600 text-xs">${data.source === 'database' ? 'از دیتابیس' : 'از حافظه موقت'}</span>`;
 
     } catch (error) {
         console.error("Error loading report:", error);
@@ -582,37 +635,79 @@ function showNotification(type, message) {
 }
 
 // =================================== 7. Status Polling ===================================
+let lastLogSeq = 0;
+let logLines = [];
+let otpPhone = null;
+
 /**
- * نظرسنجی دوره‌ای برای دریافت وضعیت فعلی ربات (لاگ‌ها و مرحله فعلی)
+ * اعمال وضعیت دریافتی ربات (لاگ‌های جدید و مرحله فعلی) روی صفحه
+ * @param {Object} data - خروجی /get-status یا رویداد status از /status-stream
  */
-setInterval(async () => {
-    try {
-        const res = await fetch('/get-status');
-        const data = await res.json();
-        
-        // نمایش/مخفی سازی بخش کد تایید
-        const otpBox = document.getElementById('otp_section');
-        if(data.otp_required) {
-            otpBox.style.display = 'block';
-        } else {
-            otpBox.style.display = 'none';
-        }
-        
-        // به‌روزرسانی وضعیت ورود و لاگ‌ها
-        document.getElementById('login_status').innerText = "وضعیت: " + data.current_step;
-        
-        // به‌روزرسانی لاگ‌ها (حداکثر 50 خط)
-        const logsElement = document.getElementById('logs');
-        if (data.logs && Array.isArray(data.logs)) {
-            const lastLogs = data.logs.slice(-50); // آخرین 50 خط
-            logsElement.innerHTML = lastLogs.map(l => `<div>> ${l}</div>`).join('');
-            // اسکرول به پایین
-            logsElement.scrollTop = logsElement.scrollHeight;
-        }
-    } catch (error) {
-        console.error("Error polling status:", error);
+function applyStatus(data) {
+    // نمایش/مخفی سازی بخش کد تایید
+    const otpBox = document.getElementById('otp_section');
+    otpPhone = data.otp_phone || null;
+    if(data.otp_required) {
+        otpBox.style.display = 'block';
+        document.getElementById('otp_phone_label').innerText = otpPhone ? `(${otpPhone})` : '';
+    } else {
+        otpBox.style.display = 'none';
+    }
+    
+    // وضعیت حساب‌های کمپین چندحسابی
+    const sessionsBox = document.getElementById('campaign_sessions');
+    if (sessionsBox) {
+        sessionsBox.innerHTML = (data.sessions || []).map(s =>
+            `<div>${s.phone}: ${s.current_step} — ${s.sent_count} موفق، ${s.failed_count} ناموفق از ${s.targets_total}</div>`
+        ).join('');
+    }
+    
+    // به‌روزرسانی وضعیت ورود و لاگ‌ها
+    document.getElementById('login_status').innerText = "وضعیت: " + data.current_step;
+    document.getElementById('rate_status').innerText = (data.rate_limits || [])
+        .map(r => `${r.name}: ${r.rate_per_minute} در دقیقه`).join(' | ');
+    
+    // به‌روزرسانی لاگ‌ها (حداکثر 50 خط آخر)
+    const logsElement = document.getElementById('logs');
+    if (data.last_seq < lastLogSeq) {
+        // سرور دوباره راه‌اندازی شده است
+        logLines = [];
     }
-}, 2000); // هر ۲ ثانیه
+    lastLogSeq = data.last_seq;
+    if (data.logs && data.logs.length > 0) {
+        logLines = logLines.concat(data.logs).slice(-50);
+        logsElement.innerHTML = logLines.map(l => `<div>> ${l}</div>`).join('');
+        // اسکرول به پایین
+        logsElement.scrollTop = logsElement.scrollHeight;
+    }
+}
+
+/**
+ * دریافت وضعیت به صورت push از سرور (SSE)؛ در نبود EventSource به نظرسنجی برمی‌گردد
+ */
+function connectStatusStream() {
+    if (!window.EventSource) {
+        setInterval(async () => {
+            try {
+                const res = await fetch(`/get-status?since=${lastLogSeq}`);
+                applyStatus(await res.json());
+            } catch (error) {
+                console.error("Error polling status:", error);
+            }
+        }, 2000); // هر ۲ ثانیه
+        return;
+    }
+    
+    // EventSource در صورت قطع اتصال خودکار با Last-Event-ID (آخرین شماره لاگ) دوباره وصل می‌شود
+    const stream = new EventSource(`/status-stream?since=${lastLogSeq}`);
+    stream.addEventListener('status', event => applyStatus(JSON.parse(event.data)));
+    stream.addEventListener('contacts', event => {
+        if (contactsStatusWatching) applyContactsStatus(JSON.parse(event.data));
+    });
+    stream.onerror = () => console.warn("Status stream disconnected, reconnecting...");
+}
+
+connectStatusStream();
 
 // =================================== 8. Contacts Management Functions ===================================
 
@@ -637,9 +732,21 @@ async function uploadContactsFile() {
     fileInfoElement.innerText = `در حال بارگذاری فایل ${file.name}...`;
     previewElement.innerHTML = `<div class="text-sm text-gray-500 text-center py-2"><i class="fa-solid fa-spinner fa-spin ml-2"></i> در حال پردازش فایل و بررسی تکراری‌ها...</div>`;
     
+    // نمایش پیشرفت پردازش فایل‌های بزرگ
+    const uploadStatusInterval = setInterval(async () => {
+        try {
+            const statusRes = await fetch('/get-upload-status');
+            const status = await statusRes.json();
+            if (status.is_running && status.total > 0) {
+                fileInfoElement.innerText = `در حال پردازش ${file.name}: ${status.processed} از ${status.total} سطر...`;
+            }
+        } catch (e) {}
+    }, 1000);
+    
     try {
         const res = await fetch('/upload-contacts-excel', {method: 'POST', body: formData});
         const data = await res.json();
+        clearInterval(uploadStatusInterval);
         
         if(data.status === 'success') {
             fileInfoElement.innerText = `فایل ${file.name} با موفقیت بارگذاری شد.`;
@@ -697,6 +804,7 @@ async function uploadContactsFile() {
             duplicateBadge.classList.add('hidden');
         }
     } catch (error) {
+        clearInterval(uploadStatusInterval);
         fileInfoElement.innerText = `خطا در ارتباط با سرور: ${error.message}`;
         previewElement.innerHTML = `<div class="text-sm text-red-500 text-center py-2">خطا در ارتباط با سرور</div>`;
         countElement.innerText = '0';
@@ -738,61 +846,79 @@ async function startAddContacts() {
     }
 }
 
+// وضعیت پیگیری عملیات افزودن مخاطبین
+let contactsStatusInterval = null;
+let contactsStatusWatching = false;
+
 /**
- * نظرسنجی وضعیت افزودن مخاطبین
+ * اعمال وضعیت دریافتی افزودن مخاطبین روی صفحه
+ * @param {Object} data - خروجی /get-contacts-status یا رویداد contacts از /status-stream
  */
-let contactsStatusInterval = null;
+function applyContactsStatus(data) {
+    // به‌روزرسانی پیشرفت
+    if (data.progress) {
+        const progress = data.progress;
+        const total = data.total || 1;
+        const percentage = Math.round((progress / total) * 100);
+        
+        document.getElementById('contacts_progress_bar').style.width = `${percentage}%`;
+        document.getElementById('contacts_progress_text').innerText = `${progress}/${total}`;
+        document.getElementById('contacts_status').innerText = data.status || 'در حال پردازش...';
+        
+        // اگر عملیات تمام شد
+        if (data.completed) {
+            stopContactsStatusPolling();
+            
+            // نمایش نتیجه نهایی
+            setTimeout(() => {
+                document.getElementById('contacts_status').innerHTML = 
+                    `عملیات تکمیل شد: <span class="text-green-600 font-bold">${data.success_count || 0} موفق</span>، <span class="text-red-600 font-bold">${data.failed_count || 0} ناموفق</span>، <span class="text-yellow-600 font-bold">${data.duplicate_count || 0} تکراری</span>`;
+                
+                // پنهان کردن پیشرفت بعد از 5 ثانیه
+                setTimeout(() => {
+                    document.getElementById('contacts_progress_container').classList.add('hidden');
+                }, 5000);
+            }, 1000);
+            
+            showNotification('success', `عملیات افزودن مخاطبین تکمیل شد. موفق: ${data.success_count || 0}، ناموفق: ${data.failed_count || 0}، تکراری: ${data.duplicate_count || 0}`);
+            
+            // به‌روزرسانی آمار دیتابیس
+            loadDatabaseStats();
+        }
+    }
+    
+    // در صورت خطا
+    if (data.error) {
+        stopContactsStatusPolling();
+        document.getElementById('contacts_status').innerText = `خطا: ${data.error}`;
+        document.getElementById('contacts_status').classList.add('text-red-500');
+        showNotification('error', `خطا در افزودن مخاطبین: ${data.error}`);
+    }
+}
 
-function startContactsStatusPolling() {
+function stopContactsStatusPolling() {
+    contactsStatusWatching = false;
     if (contactsStatusInterval) {
         clearInterval(contactsStatusInterval);
+        contactsStatusInterval = null;
+    }
+}
+
+/**
+ * پیگیری وضعیت افزودن مخاطبین (از جریان SSE یا در نبود آن با نظرسنجی)
+ */
+function startContactsStatusPolling() {
+    stopContactsStatusPolling();
+    contactsStatusWatching = true;
+    
+    if (window.EventSource) {
+        return;
     }
     
     contactsStatusInterval = setInterval(async () => {
         try {
             const res = await fetch('/get-contacts-status');
-            const data = await res.json();
-            
-            // به‌روزرسانی پیشرفت
-            if (data.progress) {
-                const progress = data.progress;
-                const total = data.total || 1;
-                const percentage = Math.round((progress / total) * 100);
-                
-                document.getElementById('contacts_progress_bar').style.width = `${percentage}%`;
-                document.getElementById('contacts_progress_text').innerText = `${progress}/${total}`;
-                document.getElementById('contacts_status').innerText = data.status || 'در حال پردازش...';
-                
-                // اگر عملیات تمام شد
-                if (data.completed) {
-                    clearInterval(contactsStatusInterval);
-                    
-                    // نمایش نتیجه نهایی
-                    setTimeout(() => {
-                        document.getElementById('contacts_status').innerHTML = 
-                            `عملیات تکمیل شد: <span class="text-green-600 font-bold">${data.success_count || 0} موفق</span>، <span class="text-red-600 font-bold">${data.failed_count || 0} ناموفق</span>، <span class="text-yellow-600 font-bold">${data.duplicate_count || 0} تکراری</span>`;
-                        
-                        // پنهان کردن پیشرفت بعد از 5 ثانیه
-                        setTimeout(() => {
-                            document.getElementById('contacts_progress_container').classList.add('hidden');
-                        }, 5000);
-                    }, 1000);
-                    
-                    showNotification('success', `عملیات افزودن مخاطبین تکمیل شد. موفق: ${data.success_count || 0}، ناموفق: ${data.failed_count || 0}، تکراری: ${data.duplicate_count || 0}`);
-                    
-                    // به‌روزرسانی آمار دیتابیس
-                    loadDatabaseStats();
-                }
-            }
-            
-            // در صورت خطا
-            if (data.error) {
-                clearInterval(contactsStatusInterval);
-                document.getElementById('contacts_status').innerText = `خطا: ${data.error}`;
-                document.getElementById('contacts_status').classList.add('text-red-500');
-                showNotification('error', `خطا در افزودن مخاطبین: ${data.error}`);
-            }
-            
+            applyContactsStatus(await res.json());
         } catch (error) {
             console.error("Error polling contacts status:", error);
         }
@@ -946,7 +1072,8 @@ async function exportContactsCSV() {
  * پاک کردن جدول خاص از دیتابیس
  */
 async function clearDatabaseTable(tableName) {
-    const tableNameText = tableName === 'contacts' ? 'مخاطبین' : 'گزارش‌ها';
+    const tableNames = {contacts: 'مخاطبین', reports: 'گزارش‌ها', failed_recipients: 'کاربران ناموجود'};
+    const tableNameText = tableNames[tableName] || tableName;
     
     if (!confirm(`آیا مطمئنید که می‌خواهید جدول ${tableNameText} را پاک کنید؟\nاین عمل غیرقابل بازگشت است!`)) {
         return;
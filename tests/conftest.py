@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# وارد کردن database فایل eitaa_bot.db (و لاگ‌ها) را در پوشه‌ی جاری می‌سازد؛ تست‌ها در پوشه‌ی موقت اجرا می‌شوند
+os.chdir(tempfile.mkdtemp(prefix="eitabot-tests-"))
+
+from database import Database
+from src.report_writer import report_writer
+
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    database = Database(str(tmp_path / "test.db"))
+    yield database
+    database.close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_report_writer():
+    # صف نویسنده‌ی گزارش به حلقه‌ی رویدادی که در آن ساخته شده وابسته است و هر تست asyncio.run خودش را دارد
+    yield
+    report_writer._queue = None
+    report_writer._task = None
@@ -0,0 +1,118 @@
+"""
+سرور محلی شبیه ایتا وب برای تست و بنچمارک بدون اینترنت
+
+صفحه‌ی index.html همان سلکتورهایی را دارد که browser_ops استفاده می‌کند (لیست چت، جستجو، گفتگو، افزودن مخاطب)
+و هر پیام ارسال شده یا مخاطب افزوده شده را به این سرور گزارش می‌دهد.
+"""
+
+import json
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+INDEX_PATH = Path(__file__).with_name("index.html")
+# نام‌های کاربری با این پیشوند در جستجو پیدا نمی‌شوند
+MISSING_USER_PREFIX = "@ghost"
+# شناسه‌ی peer -> نام کاربری؛ مشترک بین نمونه‌ها چون شناسه‌ها ثابت‌اند و کش peer در دیتابیس می‌ماند
+_peers = {}
+
+
+class MockEitaaServer:
+    def __init__(self, search_latency=0.05, asset_latency=0.02, asset_size=64 * 1024):
+        self.search_latency = search_latency
+        self.asset_latency = asset_latency
+        self.asset_size = asset_size
+        self.sent = []       # (tab, user, text, time)
+        self.contacts = []   # (tab, name, phone, time)
+        self.asset_requests = 0
+        self.lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+        self.url = None
+
+    @staticmethod
+    def peer_id(username):
+        peer_id = str(zlib.crc32(username.lower().encode("utf-8")) % 10_000_000 + 1000)
+        _peers[peer_id] = username
+        return peer_id
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, body, content_type, status=200):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/":
+                    self._reply(INDEX_PATH.read_bytes(), "text/html; charset=utf-8")
+                elif url.path == "/search":
+                    time.sleep(server.search_latency)
+                    query = parse_qs(url.query).get("q", [""])[0].strip()
+                    found = bool(query) and not query.lower().startswith(MISSING_USER_PREFIX)
+                    payload = {"query": query, "found": found, "peer_id": server.peer_id(query) if found else None}
+                    self._reply(json.dumps(payload).encode("utf-8"), "application/json")
+                elif url.path.startswith("/assets/"):
+                    time.sleep(server.asset_latency)
+                    with server.lock:
+                        server.asset_requests += 1
+                    content_type = "font/woff2" if url.path.endswith(".woff2") else "image/png"
+                    self._reply(b"\0" * server.asset_size, content_type)
+                else:
+                    self._reply(b"not found", "text/plain", 404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                data = json.loads(self.rfile.read(length) or b"{}")
+                now = time.monotonic()
+                with server.lock:
+                    if self.path == "/send":
+                        server.sent.append((data.get("tab"), _peers.get(data.get("peer")), data.get("text"), now))
+                    elif self.path == "/contacts":
+                        server.contacts.append((data.get("tab"), data.get("name"), data.get("phone"), now))
+                    else:
+                        self._reply(b"not found", "text/plain", 404)
+                        return
+                self._reply(b"{}", "application/json")
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        self.url = f"http://127.0.0.1:{self._httpd.server_port}/"
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def sent_users(self):
+        with self.lock:
+            return [user for _, user, _, _ in self.sent]
+
+    def wait_for_sent(self, count, timeout=5):
+        """انتظار تا رسیدن درخواست‌های ارسال (Enter در صفحه منتظر پاسخ fetch نمی‌ماند)"""
+        deadline = time.monotonic() + timeout
+        while len(self.sent) < count and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return self.sent_users()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from src import browser_ops, browser_pool as pool_module
+from src.browser_pool import BrowserPool
+from src.state_manager import state
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.gate = None
+
+    def is_connected(self):
+        return True
+
+
+class FakeContext:
+    def __init__(self, browser, phone):
+        self.browser = browser
+        self.phone = phone
+        self.closed = False
+        browser.contexts.append(self)
+
+    async def new_page(self):
+        return FakePage(self)
+
+    async def close(self):
+        self.closed = True
+        if self in self.browser.contexts:
+            self.browser.contexts.remove(self)
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.url = None
+
+    def on(self, event, handler):
+        pass
+
+    def is_closed(self):
+        return self.context.closed
+
+    async def goto(self, url, timeout=None):
+        if self.context.browser.gate:
+            await self.context.browser.gate.wait()
+        self.url = url
+
+    async def evaluate(self, expression):
+        return 1
+
+
+@pytest.fixture
+def fake_browser(monkeypatch, tmp_path):
+    """مرورگر جعلی و پوشه‌ی موقت نشست‌های ذخیره شده"""
+    browser = FakeBrowser()
+    logs = []
+
+    async def launch_browser():
+        return browser
+
+    async def new_account_context(b, phone=None):
+        return FakeContext(b, phone)
+
+    monkeypatch.setattr(browser_ops, "SESSIONS_DIR", str(tmp_path))
+    monkeypatch.setattr(pool_module, "launch_browser", launch_browser)
+    monkeypatch.setattr(pool_module, "new_account_context", new_account_context)
+    monkeypatch.setattr(pool_module, "add_log", logs.append)
+    monkeypatch.setattr(state, "browser", browser)
+    monkeypatch.setattr(state, "context", None)
+    browser.logs = logs
+    browser.sessions_dir = tmp_path
+    return browser
+
+
+def test_checkout_with_saved_session_returns_warm_page(fake_browser):
+    (fake_browser.sessions_dir / "989121234567.json").write_text("{}")
+    pool = BrowserPool()
+
+    async def run():
+        await pool.fill()
+        warm = pool._ready["989121234567"][0]
+        created = len(fake_browser.contexts)
+        page = await pool.checkout("+98 912 123 4567")
+        cold_contexts = len(fake_browser.contexts) - created
+        await pool._fill_task
+        return warm, page, cold_contexts
+
+    warm, page, cold_contexts = asyncio.run(run())
+    assert page is warm
+    assert page.context.phone == "989121234567"
+    assert page.url == browser_ops.EITAA_URL
+    assert cold_contexts == 0
+    # صفحه‌ی جایگزین برای همان نشست دوباره گرم شده است
+    assert len(pool._ready["989121234567"]) == 1
+
+
+def test_checkout_without_saved_session_uses_anonymous_page(fake_browser):
+    pool = BrowserPool()
+
+    async def run():
+        await pool.fill()
+        warm = pool._ready[None][0]
+        return warm, await pool.checkout("+989000000000")
+
+    warm, page = asyncio.run(run())
+    assert page is warm
+    assert page.context.phone is None
+
+
+def test_health_check_keeps_context_being_warmed(fake_browser):
+    pool = BrowserPool()
+
+    async def run():
+        fake_browser.gate = asyncio.Event()
+        filling = asyncio.create_task(pool.fill())
+        await asyncio.sleep(0.01)
+        warming = list(fake_browser.contexts)
+        health = asyncio.create_task(pool.check_health())
+        await asyncio.sleep(0.05)
+        closed_while_warming = [c for c in warming if c.closed]
+        fake_browser.gate.set()
+        await asyncio.gather(filling, health)
+        return warming, closed_while_warming
+
+    warming, closed_while_warming = asyncio.run(run())
+    assert warming and not closed_while_warming
+    assert pool._ready[None][0].context is warming[0]
+    assert not any("رها شده" in line for line in fake_browser.logs)
@@ -0,0 +1,125 @@
+import asyncio
+
+from database import targets_hash, SKIP_REASON_SENT
+from src import services
+
+
+def _drain(database, campaign_id, count, state="sent"):
+    for _ in range(count):
+        user = database.claim_campaign_target(campaign_id)
+        database.complete_campaign_target(campaign_id, user, state)
+
+
+def test_stopped_campaign_resumes_for_same_list(fresh_db):
+    campaign_id, resumed = fresh_db.start_campaign("excel", "hi", "+98", ["@a", "@b", "@c"])
+    assert not resumed
+    _drain(fresh_db, campaign_id, 1)
+    fresh_db.claim_campaign_target(campaign_id)
+    assert fresh_db.finish_campaign(campaign_id) == "stopped"
+
+    again, resumed = fresh_db.start_campaign("excel", "hi", "+98", ["@c", "@b", "@a"])
+    assert (again, resumed) == (campaign_id, True)
+    progress = fresh_db.get_campaign_progress(campaign_id)
+    assert progress["sent"] == 1 and progress["pending"] == 2 and progress["in_flight"] == 0
+
+
+def test_new_list_does_not_inherit_leftover_targets(fresh_db):
+    campaign_id, _ = fresh_db.start_campaign("excel", "hi", "+98", ["@a", "@b", "@c"])
+    _drain(fresh_db, campaign_id, 1)
+    fresh_db.finish_campaign(campaign_id)
+
+    other, resumed = fresh_db.start_campaign("excel", "hi", "+98", ["@x"])
+    assert other != campaign_id and not resumed
+    assert fresh_db.get_campaign_progress(other)["pending"] == 1
+    assert fresh_db.claim_campaign_target(other) == "@x"
+    assert fresh_db.claim_campaign_target(other) is None
+
+
+def test_resume_matches_original_list_after_dedup_filter(fresh_db):
+    original = ["@a", "@b", "@c"]
+    campaign_id, _ = fresh_db.start_campaign("tahvil", "hi\n#kw", "+98", original)
+    _drain(fresh_db, campaign_id, 1)
+    fresh_db.finish_campaign(campaign_id)
+
+    remaining, skipped = fresh_db.filter_unsent_recipients(original, "hi\n#kw")
+    assert (remaining, skipped) == (["@b", "@c"], 1)
+    again, resumed = fresh_db.start_campaign("tahvil", "hi\n#kw", "+98", remaining, [("@a", SKIP_REASON_SENT)], targets_hash(original))
+    assert (again, resumed) == (campaign_id, True)
+    # @a را خود همین کمپین فرستاده و skip شمرده نمی‌شود
+    assert fresh_db.get_recent_campaigns(1)[0]["skipped_count"] == 0
+
+
+def test_targets_hash_ignores_order_case_and_at_sign():
+    assert targets_hash(["@Ali", "reza"]) == targets_hash(["@reza", "ali", "@ali"])
+    assert targets_hash(["@ali"]) != targets_hash(["@ali", "@reza"])
+
+
+def test_claim_skips_targets_served_by_another_campaign(fresh_db):
+    first, _ = fresh_db.start_campaign("excel", "hi", "+981", ["@a", "@b"])
+    second, _ = fresh_db.start_campaign("excel", "hi", "+982", ["@b", "@c"])
+
+    assert fresh_db.claim_campaign_target(first) == "@a"
+    assert fresh_db.claim_campaign_target(first) == "@b"
+    fresh_db.complete_campaign_target(first, "@b", "sent")
+
+    # @b در صف کمپین دوم مانده ولی دیگر نباید ارسال شود
+    assert fresh_db.claim_campaign_target(second) == "@c"
+    assert fresh_db.claim_campaign_target(second) is None
+    progress = fresh_db.get_campaign_progress(second)
+    assert progress["skipped"] == 1 and progress["in_flight"] == 1
+
+
+def test_claim_skips_resumed_targets_sent_elsewhere(fresh_db):
+    campaign_id, _ = fresh_db.start_campaign("excel", "hi", "+98", ["@a", "@b"])
+    fresh_db.finish_campaign(campaign_id)
+
+    other, _ = fresh_db.start_campaign("excel", "hi", "+98", ["@a"])
+    fresh_db.claim_campaign_target(other)
+    fresh_db.complete_campaign_target(other, "@a", "sent")
+
+    resumed, was_resumed = fresh_db.start_campaign("excel", "hi", "+98", ["@a", "@b"])
+    assert (resumed, was_resumed) == (campaign_id, True)
+    assert fresh_db.claim_campaign_target(campaign_id) == "@b"
+    assert fresh_db.claim_campaign_target(campaign_id) is None
+
+
+def test_claim_skips_permanent_failures(fresh_db):
+    first, _ = fresh_db.start_campaign("excel", "one", "+98", ["@ghost"])
+    fresh_db.claim_campaign_target(first)
+    fresh_db.complete_campaign_target(first, "@ghost", "failed", "x", "user_not_found", permanent=True)
+
+    second, _ = fresh_db.start_campaign("excel", "two", "+98", ["@ghost"])
+    assert fresh_db.claim_campaign_target(second) is None
+    assert fresh_db.get_campaign_progress(second)["skipped"] == 1
+
+
+def test_resumed_campaign_accumulates_skips_without_counting_own_sends(monkeypatch, fresh_db):
+    monkeypatch.setattr(services, "db", fresh_db)
+    targets = ["@a", "@b", "@c", "@d"]
+    ghost, _ = fresh_db.start_campaign("excel", "other", "+98", ["@d"])
+    fresh_db.claim_campaign_target(ghost)
+    fresh_db.complete_campaign_target(ghost, "@d", "failed", "x", "user_not_found", permanent=True)
+
+    async def run():
+        campaign_id = await services.open_campaign("excel", "hi", "+98", targets)
+        # @d پیش از شروع کنار گذاشته شده است
+        assert fresh_db.get_recent_campaigns(1)[0]["skipped_count"] == 1
+        assert fresh_db.claim_campaign_target(campaign_id) == "@a"
+        fresh_db.complete_campaign_target(campaign_id, "@a", "sent")
+        other = await services.open_campaign("excel", "hi", "+982", ["@b"])
+        fresh_db.claim_campaign_target(other)
+        fresh_db.complete_campaign_target(other, "@b", "sent")
+        # @b هنگام برداشتن کنار گذاشته می‌شود
+        assert fresh_db.claim_campaign_target(campaign_id) == "@c"
+        fresh_db.finish_campaign(campaign_id)
+
+        resumed = await services.open_campaign("excel", "hi", "+98", targets)
+        return campaign_id, resumed
+
+    campaign_id, resumed = asyncio.run(run())
+    assert resumed == campaign_id
+    campaign = next(c for c in fresh_db.get_recent_campaigns() if c["id"] == campaign_id)
+    assert campaign["skipped_count"] == 2
+    assert fresh_db.get_campaign_progress(campaign_id) == {
+        "pending": 1, "in_flight": 0, "retry": 0, "sent": 1, "failed": 0, "skipped": 2
+    }
@@ -0,0 +1,68 @@
+import sqlite3
+
+import pytest
+
+from database import Database
+
+
+def _plan(database, query, params):
+    return " | ".join(row[3] for row in database.get_connection().execute("EXPLAIN QUERY PLAN " + query, params))
+
+
+@pytest.mark.parametrize("filters, index", [
+    ({"status": "failed", "date_from": "2026-03-01", "date_to": "2026-03-31"}, "idx_reports_status_timestamp"),
+    ({"operation_type": "excel", "date_from": "2026-03-01"}, "idx_reports_operation_timestamp"),
+    ({"phone_number": "+989121111111"}, "idx_reports_phone_timestamp"),
+    ({"date_from": "2026-03-01", "date_to": "2026-03-02"}, "idx_reports_timestamp"),
+    ({"status": "success", "cursor": "2026-03-01 10:00:00|5"}, "idx_reports_status_timestamp"),
+])
+def test_report_filters_use_index(fresh_db, filters, index):
+    query, params = fresh_db._dispatch_reports_query(**filters)
+    plan = _plan(fresh_db, query, params)
+    assert f"USING INDEX {index}" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_date_filter_is_range_on_timestamp(fresh_db):
+    query, _ = fresh_db._dispatch_reports_query(date_from="2026-03-01", date_to="2026-03-02")
+    assert "DATE(TIMESTAMP)" not in query.upper()
+    assert "timestamp >= ?" in query
+
+
+def test_migrations_reach_latest_version(fresh_db):
+    version = fresh_db.get_connection().execute("PRAGMA user_version").fetchone()[0]
+    assert version == len(Database.SCHEMA_MIGRATIONS)
+
+
+def test_failed_migration_leaves_no_partial_schema(tmp_path):
+    path = str(tmp_path / "migrate.db")
+    Database(path).close()
+    latest = len(Database.SCHEMA_MIGRATIONS)
+
+    def broken_step(conn):
+        raise RuntimeError("boom")
+
+    class BrokenDatabase(Database):
+        SCHEMA_MIGRATIONS = Database.SCHEMA_MIGRATIONS + [
+            ["ALTER TABLE campaigns ADD COLUMN extra TEXT", broken_step],
+        ]
+
+    with pytest.raises(RuntimeError):
+        BrokenDatabase(path)
+
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == latest
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(campaigns)")]
+        assert "extra" not in columns
+    finally:
+        conn.close()
+
+    class FixedDatabase(Database):
+        SCHEMA_MIGRATIONS = Database.SCHEMA_MIGRATIONS + [
+            ["ALTER TABLE campaigns ADD COLUMN extra TEXT"],
+        ]
+
+    database = FixedDatabase(path)
+    assert database.get_connection().execute("PRAGMA user_version").fetchone()[0] == latest + 1
+    database.close()
@@ -0,0 +1,187 @@
+import asyncio
+
+import pytest
+from playwright.async_api import async_playwright
+
+from database import db
+from mock_eitaa.server import MockEitaaServer
+from src import browser_ops, services
+from src.rate_limiter import RateLimiter
+from src.state_manager import state
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.closed = False
+        context.pages.append(self)
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_tabs(monkeypatch):
+    """صفحه‌ی اصلی و تب‌های اضافه‌ی جعلی در یک context"""
+    context = FakeContext()
+    main = FakePage(context)
+
+    async def open_extra_pages(count, ctx=None):
+        return [FakePage(ctx or context) for _ in range(count)]
+
+    monkeypatch.setattr(services, "open_extra_pages", open_extra_pages)
+    monkeypatch.setattr(state, "page", main)
+    monkeypatch.setattr(state, "stop_requested", False)
+    yield main
+    state.target_list = []
+
+
+def test_failing_tab_cancels_sibling_workers(monkeypatch, fake_tabs):
+    sent = []
+    broken = {}
+
+    async def send(page, user, *args):
+        await asyncio.sleep(0.01)
+        sent.append(user)
+        # اولین تب اضافه پس از اولین ارسالش از کار می‌افتد و بازسازی آن شکست می‌خورد
+        if page is not fake_tabs:
+            broken.setdefault("page", page)
+        return True, "ok", None
+
+    async def probe(page):
+        return page is not broken.get("page")
+
+    async def recover(page, *args):
+        raise RuntimeError("بازسازی صفحه‌ی مرورگر ممکن نشد")
+
+    monkeypatch.setattr(services, "send_direct_message", send)
+    monkeypatch.setattr(services.browser_pool, "probe", probe)
+    monkeypatch.setattr(services, "recover_page", recover)
+    monkeypatch.setattr(services, "RateLimiter", lambda *a, **k: RateLimiter(0.1, 0.1))
+
+    state.target_list = [f"@cancel{i}" for i in range(40)]
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await services.handle_excel_mode(fake_tabs, "+98", "cancel-test", 0, 0, tabs=3)
+        after_return = len(sent)
+        await asyncio.sleep(0.3)
+        pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task() and "campaign_send_worker" in repr(t)]
+        await services.report_writer.stop()
+        return after_return, pending
+
+    after_return, pending = asyncio.run(run())
+    assert len(sent) == after_return < 40
+    assert pending == []
+    assert all(page.closed for page in fake_tabs.context.pages if page is not fake_tabs)
+
+
+@pytest.fixture
+def mock_eitaa(monkeypatch):
+    """صفحه‌ی محلی شبیه ایتا به جای web.eitaa.com"""
+    monkeypatch.setattr(state, "page", None)
+    monkeypatch.setattr(state, "context", None)
+    monkeypatch.setattr(state, "stop_requested", False)
+    with MockEitaaServer() as server:
+        monkeypatch.setattr(browser_ops, "EITAA_URL", server.url)
+        yield server
+    state.target_list = []
+
+
+async def _open_browser():
+    playwright = await async_playwright().start()
+    try:
+        browser = await playwright.chromium.launch(headless=True)
+    except Exception as e:
+        await playwright.stop()
+        pytest.skip(f"Chromium در دسترس نیست: {str(e).splitlines()[0]}")
+    return playwright, browser
+
+
+async def _run_excel_mode(server, msg, tabs):
+    playwright, browser = await _open_browser()
+    try:
+        context = await browser.new_context()
+        page = await context.new_page()
+        await page.goto(server.url)
+        state.context = context
+        state.page = page
+        result = await services.handle_excel_mode(page, "+98", msg, 0.1, 0.1, tabs)
+        return result, len(context.pages)
+    finally:
+        await services.report_writer.stop()
+        await browser.close()
+        await playwright.stop()
+
+
+@pytest.mark.parametrize("tabs", [1, 3])
+def test_excel_mode_sends_each_target_once_across_tabs(mock_eitaa, tabs):
+    targets = [f"@tabs{tabs}user{i}" for i in range(9)]
+    state.target_list = list(targets)
+
+    result, open_pages = asyncio.run(_run_excel_mode(mock_eitaa, f"mock-tabs-{tabs}", tabs))
+
+    assert result is True
+    assert sorted(mock_eitaa.wait_for_sent(len(targets))) == sorted(targets)
+    assert len({tab for tab, *_ in mock_eitaa.sent}) == tabs
+    assert open_pages == 1
+
+
+def test_missing_user_is_stored_only_from_no_results_page(mock_eitaa):
+    state.target_list = ["@ghostmockuser", "@realmockuser"]
+
+    result, _ = asyncio.run(_run_excel_mode(mock_eitaa, "mock-missing", 1))
+
+    assert result is True
+    assert mock_eitaa.wait_for_sent(1) == ["@realmockuser"]
+    assert db.filter_permanent_failures(["@ghostmockuser", "@realmockuser"]) == (["@realmockuser"], 1)
+
+
+def test_closed_tab_with_failed_recovery_stops_every_tab(monkeypatch, mock_eitaa):
+    targets = [f"@stopuser{i}" for i in range(30)]
+    state.target_list = list(targets)
+    real_send = services.send_direct_message
+    closed = []
+
+    async def send_then_close_extra_tab(page, user, *args):
+        result = await real_send(page, user, *args)
+        if page is not state.page and not closed:
+            closed.append(page)
+            await page.close()
+        return result
+
+    async def recover(page, *args):
+        raise RuntimeError("بازسازی صفحه‌ی مرورگر ممکن نشد")
+
+    monkeypatch.setattr(services, "send_direct_message", send_then_close_extra_tab)
+    monkeypatch.setattr(services, "recover_page", recover)
+
+    async def run():
+        playwright, browser = await _open_browser()
+        try:
+            context = await browser.new_context()
+            state.context = context
+            state.page = await context.new_page()
+            await state.page.goto(mock_eitaa.url)
+            with pytest.raises(RuntimeError):
+                await services.handle_excel_mode(state.page, "+98", "mock-cancel", 0.1, 0.1, 3)
+            # مرورگر هنوز باز است؛ هیچ تب دیگری نباید به ارسال ادامه دهد
+            sent_at_return = len(mock_eitaa.wait_for_sent(len(targets), timeout=0.5))
+            await asyncio.sleep(1.5)
+            return sent_at_return, len(mock_eitaa.sent_users()), len(context.pages)
+        finally:
+            await services.report_writer.stop()
+            await browser.close()
+            await playwright.stop()
+
+    sent_at_return, sent_later, open_pages = asyncio.run(run())
+    assert sent_later == sent_at_return < len(targets)
+    assert open_pages == 1
@@ -0,0 +1,38 @@
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from src.failures import (
+    classify_error, is_permanent, retry_delay, UserNotFoundError,
+    USER_NOT_FOUND, SELECTOR_TIMEOUT, PAGE_CRASHED, INPUT_NOT_READY, UNKNOWN,
+)
+
+
+def test_only_explicit_no_results_is_user_not_found():
+    assert classify_error(UserNotFoundError("@ghost"), "open") == USER_NOT_FOUND
+    assert is_permanent(USER_NOT_FOUND)
+
+
+def test_search_timeout_is_transient():
+    kind = classify_error(PlaywrightTimeoutError("Timeout 10000ms exceeded."), "open")
+    assert kind == SELECTOR_TIMEOUT
+    assert not is_permanent(kind)
+
+
+def test_stage_and_crash_classification():
+    assert classify_error(PlaywrightTimeoutError("Timeout 10000ms exceeded."), "input") == INPUT_NOT_READY
+    assert classify_error(Exception("Target crashed"), "input") == PAGE_CRASHED
+    assert classify_error(Exception("Page.click: Target page, context or browser has been closed"), "open") == PAGE_CRASHED
+    assert classify_error(ValueError("something else"), "open") == UNKNOWN
+
+
+def test_retry_delay_doubles_per_attempt():
+    assert retry_delay(SELECTOR_TIMEOUT, 2) == 2 * retry_delay(SELECTOR_TIMEOUT, 1)
+
+
+def test_failed_recipients_can_be_reset(fresh_db):
+    campaign_id, _ = fresh_db.start_campaign("excel", "hi", "+98", ["@ghost"])
+    fresh_db.claim_campaign_target(campaign_id)
+    fresh_db.complete_campaign_target(campaign_id, "@ghost", "failed", "x", USER_NOT_FOUND, permanent=True)
+    assert fresh_db.filter_permanent_failures(["@ghost"]) == ([], 1)
+
+    fresh_db.clear_database("failed_recipients")
+    assert fresh_db.filter_permanent_failures(["@ghost"]) == (["@ghost"], 0)
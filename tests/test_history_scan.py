@@ -0,0 +1,83 @@
+import asyncio
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from src.browser_ops import scan_history_for_prefix, HISTORY_START_SELECTOR, CHAT_SCROLLABLE_SELECTOR
+
+
+class FakeLocator:
+    def __init__(self, page, selector):
+        self.page = page
+        self.selector = selector
+        self.first = self
+
+    async def count(self):
+        if self.selector == HISTORY_START_SELECTOR:
+            return int(self.page.loaded_from == 1)
+        return int(self.selector == CHAT_SCROLLABLE_SELECTOR)
+
+    async def evaluate(self, script):
+        self.page.load_older()
+
+
+class FakeHistoryPage:
+    """گفتگویی با پیام‌های 1..total که با هر اسکرول به بالا batch پیام قدیمی‌تر بارگذاری می‌کند"""
+
+    def __init__(self, texts, batch=10, loads=None):
+        self.texts = texts
+        self.batch = batch
+        self.loads = loads
+        self.loaded_from = max(len(texts) - batch + 1, 1)
+
+    def load_older(self):
+        if self.loads == 0:
+            return
+        if self.loads is not None:
+            self.loads -= 1
+        self.loaded_from = max(self.loaded_from - self.batch, 1)
+
+    def locator(self, selector):
+        return FakeLocator(self, selector)
+
+    async def evaluate(self, script, args):
+        _, _, after_mid, before_mid = args
+        mids = range(self.loaded_from, len(self.texts) + 1)
+        messages = [[mid, self.texts[mid - 1]] for mid in mids
+                    if mid > after_mid and (before_mid is None or mid < before_mid)]
+        return {"messages": messages, "oldest": self.loaded_from, "newest": len(self.texts)}
+
+    async def wait_for_function(self, expression, arg, timeout):
+        if self.loaded_from >= arg[1]:
+            raise PlaywrightTimeoutError("Timeout exceeded")
+
+
+def _scan(page, after_mid=0, **kwargs):
+    return asyncio.run(scan_history_for_prefix(page, "تحویل", after_mid, **kwargs))
+
+
+def test_scan_reaching_previous_mark_is_complete():
+    text, newest, scanned, complete = _scan(FakeHistoryPage(["سلام"] * 100), after_mid=75)
+    assert (text, newest, scanned, complete) == (None, 100, 25, True)
+
+
+def test_scan_reaching_start_of_history_is_complete():
+    text, newest, scanned, complete = _scan(FakeHistoryPage(["سلام"] * 25))
+    assert (text, newest, scanned, complete) == (None, 25, 25, True)
+
+
+def test_slow_history_load_is_not_complete():
+    text, newest, scanned, complete = _scan(FakeHistoryPage(["سلام"] * 100, loads=1))
+    assert (text, scanned, complete) == (None, 20, False)
+
+
+def test_max_pages_is_not_complete():
+    text, newest, scanned, complete = _scan(FakeHistoryPage(["سلام"] * 100), max_pages=2)
+    assert (text, scanned, complete) == (None, 30, False)
+
+
+def test_newest_prefixed_message_is_returned():
+    texts = ["سلام"] * 50
+    texts[9] = "تحویل @old"
+    texts[44] = "تحویل @new"
+    text, newest, scanned, complete = _scan(FakeHistoryPage(texts))
+    assert (text, newest, complete) == ("تحویل @new", 50, True)
@@ -0,0 +1,35 @@
+import asyncio
+import json
+
+from log_store import JsonlLogStore
+
+
+def _write(path, messages):
+    with open(path, "w", encoding="utf-8") as f:
+        for message in messages:
+            f.write((json.dumps({"message": message}) if message != "broken" else "{broken") + "\n")
+
+
+def _read_all(store, limit):
+    async def run():
+        messages, offset = [], 0
+        while offset is not None:
+            logs, offset = await store.read(offset, limit)
+            messages.extend(entry["message"] for entry in logs)
+        return messages
+
+    return asyncio.run(run())
+
+
+def test_pages_do_not_repeat_after_malformed_lines(tmp_path):
+    store = JsonlLogStore(str(tmp_path / "bot_logs.jsonl"))
+    _write(store.path, ["a", "broken", "b", "c", "broken", "d", "e"])
+    assert _read_all(store, 2) == ["a", "b", "c", "d", "e"]
+
+
+def test_pages_continue_into_rotated_files(tmp_path):
+    store = JsonlLogStore(str(tmp_path / "bot_logs.jsonl"), backup_count=2)
+    _write(f"{store.path}.2", ["a", "b"])
+    _write(f"{store.path}.1", ["c"])
+    _write(store.path, ["d", "e"])
+    assert _read_all(store, 2) == ["a", "b", "c", "d", "e"]
@@ -0,0 +1,56 @@
+import asyncio
+
+from src import services
+from src.failures import USER_NOT_FOUND
+from src.rate_limiter import RateLimiter
+
+
+def test_adaptive_interval_never_drops_below_min_delay():
+    limiter = RateLimiter(7, 15)
+    for _ in range(200):
+        limiter.record(True, 0.5)
+    assert limiter.interval == 7
+
+
+def test_failures_back_off_up_to_ceiling():
+    limiter = RateLimiter(1, 2)
+    for _ in range(50):
+        limiter.record(False, 0.5)
+    assert limiter.interval == limiter.ceiling
+
+
+def test_acquire_keeps_configured_pace():
+    async def run():
+        limiter = RateLimiter(0.1, 0.1)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(6):
+            await limiter.acquire()
+        return loop.time() - started
+
+    # اولین توکن آماده است؛ پنج توکن بعدی هر کدام حدود 0.1 ثانیه (با نوسان ±20%)
+    assert asyncio.run(run()) >= 5 * 0.1 * 0.8
+
+
+def test_permanent_failures_do_not_slow_the_limiter(monkeypatch):
+    async def not_found(page, user, *args):
+        return False, "not found", USER_NOT_FOUND
+
+    monkeypatch.setattr(services, "send_direct_message", not_found)
+
+    async def run():
+        monkeypatch.setattr(services.browser_pool, "probe", _always_alive)
+        campaign_id = await services.open_campaign("excel", "limiter-permanent", "+98", [f"@missing{i}" for i in range(4)])
+        limiter = RateLimiter(0.1, 0.1)
+        await services.campaign_send_worker(object(), campaign_id, limiter, "+98", "limiter-permanent", "excel")
+        await services.close_campaign(campaign_id)
+        await services.report_writer.stop()
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter.interval == 0.1
+    assert limiter.snapshot()["recent_failures"] == 0
+
+
+async def _always_alive(page):
+    return True
@@ -0,0 +1,54 @@
+import asyncio
+
+from src import services
+from src.rate_limiter import RateLimiter
+from src.sessions import AccountSession
+
+
+class FakeContext:
+    pass
+
+
+class FakePage:
+    def __init__(self):
+        self.context = FakeContext()
+
+
+def test_account_campaign_releases_its_context(monkeypatch):
+    released = []
+
+    async def ensure_session_page(session):
+        session.page = FakePage()
+        session.context = session.page.context
+        return session.page
+
+    async def login_if_needed(page, phone, owner):
+        pass
+
+    async def send(page, user, *args):
+        return True, "ok", None
+
+    async def release(page):
+        released.append(page)
+
+    async def alive(page):
+        return True
+
+    monkeypatch.setattr(services, "ensure_session_page", ensure_session_page)
+    monkeypatch.setattr(services, "login_if_needed", login_if_needed)
+    monkeypatch.setattr(services, "send_direct_message", send)
+    monkeypatch.setattr(services.browser_pool, "release", release)
+    monkeypatch.setattr(services.browser_pool, "probe", alive)
+    monkeypatch.setattr(services, "RateLimiter", lambda *a, **k: RateLimiter(0.1, 0.1))
+
+    async def run():
+        session = AccountSession("+989120000001")
+        ok = await services.run_account_campaign(session, ["@session-a", "@session-b"], "session-release", 0, 0)
+        await services.report_writer.stop()
+        return session, ok
+
+    session, ok = asyncio.run(run())
+    assert ok
+    assert session.sent_count == 2
+    assert len(released) == 1
+    assert session.page is None and session.context is None